@@ -2,43 +2,37 @@
 """
 Asana API client for task management.
 Usage: python3 asana_api.py <command> [args]
+
+Commands print the records returned by asana_lib.AsanaClient; import that
+module instead to use the same operations from Python.
 """
 
+import csv
 import json
-import os
+import re
 import sys
-from pathlib import Path
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
-from urllib.parse import urlencode
-
-ASANA_API_BASE = "https://app.asana.com/api/1.0"
-
-
-def load_env():
-    """Load .env file following priority order."""
-    env_paths = [
-        Path(__file__).parent / ".env",
-        Path(__file__).parent.parent / ".env",
-        Path.home() / ".claude" / "skills" / ".env",
-        Path.home() / ".claude" / ".env",
-    ]
-    
-    for env_path in env_paths:
-        if env_path.exists():
-            with open(env_path) as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith("#") and "=" in line:
-                        key, value = line.split("=", 1)
-                        if key.strip() not in os.environ:
-                            os.environ[key.strip()] = value.strip().strip('"').strip("'")
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from asana_batch import MAX_BATCH_ACTIONS, BatchQueue
+from asana_client import NETWORK_ERRORS, APIError, configure_response_cache, describe_error
+from asana_config import get_config
+from asana_identity import get_identity_cache
+from asana_lib import (ME_FIELDS, PROJECT_FIELDS, SEARCH_FIELDS, STORY_FIELDS, SUBTASK_FIELDS, TASK_FIELDS,
+                       TASK_LIST_FIELDS, USER_FIELDS, WRITE_FIELDS, AsanaClient)
+from asana_mirror import Mirror
+from asana_output import FORMATS, columns, field_value, write_records
+from asana_server import serve, shell
+from asana_trace import finish_tracing, start_tracing
+
+_client = None
 
 
 def get_token():
     """Get Asana Personal Access Token."""
-    load_env()
-    token = os.environ.get("ASANA_PAT") or os.environ.get("ASANA_TOKEN")
+    token = get_config().token
     if not token:
         print("ERROR: ASANA_PAT not set. Create .env file with:")
         print("  ASANA_PAT=your_personal_access_token")
@@ -46,32 +40,46 @@ def get_token():
     return token
 
 
-def api_request(endpoint, method="GET", data=None):
-    """Make Asana API request."""
-    url = f"{ASANA_API_BASE}{endpoint}"
-    headers = {
-        "Authorization": f"Bearer {get_token()}",
-        "Content-Type": "application/json",
-    }
-    
-    body = json.dumps({"data": data}).encode() if data else None
-    req = Request(url, data=body, headers=headers, method=method)
-    
-    try:
-        with urlopen(req) as response:
-            return json.loads(response.read().decode())
-    except HTTPError as e:
-        error_body = e.read().decode()
-        print(f"API Error {e.code}: {error_body}")
-        sys.exit(1)
+def get_client() -> AsanaClient:
+    """The AsanaClient for the configured token (re-created if `reload` changed it)."""
+    global _client
+    token = get_token()
+    if _client is None or _client.token != token:
+        _client = AsanaClient(token)
+    return _client
+
+
+# ============== FIELD PROJECTION ==============
+
+def parse_fields(value: str) -> list:
+    """Split a --fields value (comma-separated, dotted paths allowed)."""
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+def format_row(record: dict, fields: list) -> str:
+    """One list row for --fields output: [gid] value | value | ..."""
+    return f"  [{record.get('gid')}] " + " | ".join(field_value(record, field) for field in fields)
+
+
+def print_record(record: dict, fields: list):
+    """--fields output for a single record: GID, then one `field: value` line each."""
+    print(f"GID: {record.get('gid')}")
+    for field in fields:
+        print(f"{field}: {field_value(record, field)}")
 
 
 # ============== TASK OPERATIONS ==============
 
-def get_task(task_id):
-    """Get task details."""
-    result = api_request(f"/tasks/{task_id}")
-    task = result.get("data", {})
+def get_task(task_id, fields=None, fmt=None):
+    """Get task details; fields selects what to fetch and print."""
+    task = get_client().get_task(task_id, fields)
+    
+    if fmt:
+        write_records([task], fmt, columns(fields, TASK_FIELDS), single=True)
+        return task
+    if fields:
+        print_record(task, fields)
+        return task
     
     print(f"Task: {task.get('name')}")
     print(f"GID: {task.get('gid')}")
@@ -88,98 +96,100 @@ def get_task(task_id):
 
 def complete_task(task_id):
     """Mark task as complete."""
-    api_request(f"/tasks/{task_id}", method="PUT", data={"completed": True})
+    get_client().complete_task(task_id)
     print(f"Task {task_id} marked as complete")
 
 
 def incomplete_task(task_id):
     """Mark task as incomplete."""
-    api_request(f"/tasks/{task_id}", method="PUT", data={"completed": False})
+    get_client().incomplete_task(task_id)
     print(f"Task {task_id} marked as incomplete")
 
 
 def update_task(task_id, **kwargs):
     """Update task fields (name, notes, due_on)."""
-    data = {}
-    if "name" in kwargs:
-        data["name"] = kwargs["name"]
-    if "notes" in kwargs:
-        data["notes"] = kwargs["notes"]
-    if "due_on" in kwargs:
-        data["due_on"] = kwargs["due_on"]  # Format: YYYY-MM-DD
-    if "assignee" in kwargs:
-        data["assignee"] = kwargs["assignee"]  # User GID
+    data = {key: kwargs[key] for key in ("name", "notes", "due_on", "assignee") if key in kwargs}
     
     if not data:
         print("No fields to update")
         return
     
-    result = api_request(f"/tasks/{task_id}", method="PUT", data=data)
+    task = get_client().update_task(task_id, **data)
     print(f"Task {task_id} updated successfully")
-    return result.get("data", {})
+    return task
 
 
 def create_task(project_id, name, **kwargs):
     """Create a new task in project."""
-    data = {
-        "name": name,
-        "projects": [project_id],
-    }
-    if "notes" in kwargs:
-        data["notes"] = kwargs["notes"]
-    if "due_on" in kwargs:
-        data["due_on"] = kwargs["due_on"]
-    if "assignee" in kwargs:
-        data["assignee"] = kwargs["assignee"]
-    
-    result = api_request("/tasks", method="POST", data=data)
-    task = result.get("data", {})
+    data = {key: kwargs[key] for key in ("notes", "due_on", "assignee") if key in kwargs}
+    task = get_client().create_task(project_id, name, **data)
     print(f"Created task: {task.get('name')} (GID: {task.get('gid')})")
     return task
 
 
 def assign_task(task_id, user_gid):
     """Assign task to user."""
-    api_request(f"/tasks/{task_id}", method="PUT", data={"assignee": user_gid})
+    get_client().assign_task(task_id, user_gid)
     print(f"Task {task_id} assigned to user {user_gid}")
 
 
 def unassign_task(task_id):
     """Unassign task."""
-    api_request(f"/tasks/{task_id}", method="PUT", data={"assignee": None})
+    get_client().unassign_task(task_id)
     print(f"Task {task_id} unassigned")
 
 
 def add_comment(task_id, text):
     """Add comment to task."""
-    api_request(f"/tasks/{task_id}/stories", method="POST", data={"text": text})
+    get_client().add_comment(task_id, text)
     print(f"Comment added to task {task_id}")
 
 
-def get_stories(task_id):
-    """Get comments/stories of a task."""
-    result = api_request(f"/tasks/{task_id}/stories?opt_fields=created_at,created_by.name,text,type,resource_subtype")
-    stories = result.get("data", [])
+def get_stories(task_id, fields=None, max_items=None, since=None, new=False, fmt=None):
+    """Get comments/stories of a task, printing each as it is parsed.
+    
+    since keeps stories created at or after an ISO date/time. With new=True
+    only stories added since the previous new=True call for this task are
+    fetched and printed (see asana_stories).
+    """
+    if new:
+        # No --max here: the mark has already moved past every returned story.
+        stories = get_client().new_stories(task_id, fields)
+        if since:
+            stories = [story for story in stories if story.get("created_at", "") >= since]
+    else:
+        stories = get_client().get_stories(task_id, fields, max_items, since)
     
+    if fmt:
+        return write_records(stories, fmt, columns(fields, STORY_FIELDS))
     print(f"Stories for task {task_id}:")
+    count = 0
     for story in stories:
-        if story.get("resource_subtype") == "comment_added":
+        count += 1
+        if fields:
+            print(format_row(story, fields))
+        elif story.get("resource_subtype") == "comment_added":
             created_by = story.get("created_by", {}).get("name", "Unknown")
             created_at = story.get("created_at", "")[:10]
             text = story.get("text", "")
             print(f"\n[{created_at}] {created_by}:")
             print(f"  {text}")
     
-    return stories
+    return count
 
 
-def get_subtasks(task_id):
+def get_subtasks(task_id, fields=None, fmt=None):
     """Get subtasks of a task."""
-    result = api_request(f"/tasks/{task_id}/subtasks?opt_fields=name,completed,due_on,assignee.name")
-    subtasks = result.get("data", [])
+    subtasks = get_client().get_subtasks(task_id, fields)
     
+    if fmt:
+        write_records(subtasks, fmt, columns(fields, SUBTASK_FIELDS))
+        return subtasks
     print(f"Subtasks of {task_id}:")
     for task in subtasks:
+        if fields:
+            print(format_row(task, fields))
+            continue
         status = "✓" if task.get("completed") else "○"
         assignee = task.get("assignee")
         assignee_name = assignee.get("name") if assignee else ""
@@ -188,92 +198,163 @@ def get_subtasks(task_id):
     return subtasks
 
 
+def get_subtask_tree(task_id, fields=None, depth=None, concurrency=8, fmt=None):
+    """Print the whole subtask hierarchy of a task as it is fetched.
+    
+    Rows are indented by level, or written in fmt as records carrying
+    "depth" and "parent". Returns the number of subtasks.
+    """
+    nodes = get_client().walk_subtasks(task_id, fields, depth, concurrency)
+    if fmt:
+        records = ({"depth": level, "parent": parent, **task} for level, parent, task in nodes)
+        return write_records(records, fmt, ["depth", "parent"] + columns(fields, SUBTASK_FIELDS))
+    print(f"Subtask tree of {task_id}:")
+    count = 0
+    for level, parent, task in nodes:
+        count += 1
+        indent = "  " * level
+        if fields:
+            print(indent + format_row(task, fields).lstrip())
+            continue
+        status = "✓" if task.get("completed") else "○"
+        assignee = task.get("assignee")
+        assignee_name = assignee.get("name") if assignee else ""
+        print(f"{indent}{status} [{task['gid']}] {task['name']} ({assignee_name})")
+    
+    print(f"({count} subtasks)")
+    return count
+
+
 def create_subtask(parent_task_id, name, **kwargs):
     """Create subtask under parent task."""
-    data = {"name": name}
-    if "notes" in kwargs:
-        data["notes"] = kwargs["notes"]
-    if "due_on" in kwargs:
-        data["due_on"] = kwargs["due_on"]
-    if "assignee" in kwargs:
-        data["assignee"] = kwargs["assignee"]
-    
-    result = api_request(f"/tasks/{parent_task_id}/subtasks", method="POST", data=data)
-    task = result.get("data", {})
+    data = {key: kwargs[key] for key in ("notes", "due_on", "assignee") if key in kwargs}
+    task = get_client().create_subtask(parent_task_id, name, **data)
     print(f"Created subtask: {task.get('name')} (GID: {task.get('gid')})")
     return task
 
 
 # ============== PROJECT OPERATIONS ==============
 
-def list_tasks(project_id, limit=50):
-    """List tasks in project."""
-    result = api_request(f"/projects/{project_id}/tasks?opt_fields=name,completed,due_on,assignee.name&limit={limit}")
-    tasks = result.get("data", [])
+def list_tasks(project_id, max_items=None, local=False, fields=None, fmt=None):
+    """List tasks in project, streaming rows as each page arrives.
+    
+    With local=True, rows come from the sync-project mirror instead of the API.
+    """
+    if local:
+        mirror = Mirror()
+        if mirror.synced_at(project_id) is None:
+            print(f"No local mirror for project {project_id}. Run: sync-project {project_id}")
+            sys.exit(1)
+        tasks = islice(mirror.iter_tasks(project_id), max_items)
+    else:
+        tasks = get_client().list_tasks(project_id, fields, max_items)
     
+    if fmt:
+        return write_records(tasks, fmt, columns(fields, TASK_LIST_FIELDS))
     print(f"Tasks in project {project_id}:")
+    count = 0
     for task in tasks:
+        count += 1
+        if fields:
+            print(format_row(task, fields))
+            continue
         status = "✓" if task.get("completed") else "○"
         assignee = task.get("assignee")
         assignee_name = assignee.get("name") if assignee else ""
         due = task.get("due_on") or ""
         print(f"  {status} [{task['gid']}] {task['name']} | {assignee_name} | {due}")
     
-    return tasks
+    return count
 
 
-def list_projects(workspace_id=None):
-    """List projects in workspace."""
-    if not workspace_id:
-        # Get first workspace from user
-        me = api_request("/users/me")
-        workspaces = me.get("data", {}).get("workspaces", [])
-        if not workspaces:
-            print("No workspaces found")
-            return []
-        workspace_id = workspaces[0]["gid"]
+def sync_project_mirror(project_id, comments=None):
+    """Update the local mirror of a project from the Events API."""
+    started = time.perf_counter()
+    summary = get_client().sync_project(project_id, comments)
+    elapsed = (time.perf_counter() - started) * 1000
     
-    result = api_request(f"/workspaces/{workspace_id}/projects?opt_fields=name,archived&limit=100")
-    projects = result.get("data", [])
+    if summary["mode"] == "full":
+        print(f"Full sync of project {project_id}: {summary['loaded']} tasks ({elapsed:.0f} ms)")
+    else:
+        print(f"Synced project {project_id}: {summary['changed']} changed, "
+              f"{summary['removed']} removed, {summary['comments']} re-indexed comments ({elapsed:.0f} ms)")
+    return summary
+
+
+def list_projects(workspace_id=None, max_items=None, fields=None, fmt=None):
+    """List projects in workspace (default: the identity cache's default workspace)."""
+    workspace_id = workspace_id or get_client().default_workspace()
+    if not workspace_id:
+        print("No workspaces found")
+        return 0
+    projects = get_client().list_projects(workspace_id, fields, max_items)
     
+    if fmt:
+        return write_records(projects, fmt, columns(fields, PROJECT_FIELDS))
     print(f"Projects in workspace {workspace_id}:")
+    count = 0
     for project in projects:
-        if not project.get("archived"):
+        if fields:
+            print(format_row(project, fields))
+            count += 1
+        elif not project.get("archived"):
             print(f"  [{project['gid']}] {project['name']}")
+            count += 1
     
-    return projects
+    return count
 
 
 # ============== SEARCH ==============
 
-def search_tasks(workspace_id, query, limit=20):
-    """Search tasks in workspace."""
-    params = urlencode({
-        "text": query,
-        "opt_fields": "name,completed,due_on,assignee.name,projects.name",
-        "limit": limit
-    })
-    result = api_request(f"/workspaces/{workspace_id}/tasks/search?{params}")
-    tasks = result.get("data", [])
+def search_tasks(workspace_id, query, max_items=20, fields=None, local=False, fmt=None):
+    """Search tasks in workspace.
     
+    With local=True, the FTS index of every sync-project mirror is searched
+    instead, ranked by relevance, and matching notes/comments are excerpted.
+    """
+    if local:
+        started = time.perf_counter()
+        tasks = list(Mirror().search(query, max_items))
+        elapsed = (time.perf_counter() - started) * 1000
+    else:
+        tasks = get_client().search_tasks(workspace_id, query, fields, max_items)
+    
+    if fmt:
+        return write_records(tasks, fmt, columns(fields, SEARCH_FIELDS + (",snippet" if local else "")))
     print(f"Search results for '{query}':")
+    count = 0
     for task in tasks:
+        count += 1
+        if fields:
+            print(format_row(task, fields))
+            continue
         status = "✓" if task.get("completed") else "○"
         assignee = task.get("assignee")
         assignee_name = assignee.get("name") if assignee else ""
         projects = task.get("projects", [])
         project_name = projects[0].get("name") if projects else ""
         print(f"  {status} [{task['gid']}] {task['name']} | {project_name} | {assignee_name}")
+        snippet = task.get("snippet")
+        if snippet and snippet.replace("[", "").replace("]", "") != task["name"]:
+            print(f"      {' '.join(snippet.split())}")
     
-    return tasks
+    if local:
+        print(f"({count} local matches, {elapsed:.1f} ms)")
+    return count
 
 
 # ============== USER OPERATIONS ==============
 
-def get_me():
+def get_me(fields=None, fmt=None):
     """Get current user info."""
-    result = api_request("/users/me")
-    user = result.get("data", {})
+    user = get_client().me(fields)
+    
+    if fmt:
+        write_records([user], fmt, columns(fields, ME_FIELDS), single=True)
+        return user
+    if fields:
+        print_record(user, fields)
+        return user
     print(f"User: {user.get('name')}")
     print(f"GID: {user.get('gid')}")
     print(f"Email: {user.get('email')}")
@@ -283,28 +364,208 @@ def get_me():
     return user
 
 
-def list_users(workspace_id=None):
+def list_users(workspace_id=None, max_items=None, fields=None, fmt=None):
     """List users in workspace."""
+    workspace_id = workspace_id or get_client().default_workspace()
     if not workspace_id:
-        me = api_request("/users/me")
-        workspaces = me.get("data", {}).get("workspaces", [])
-        if not workspaces:
-            print("No workspaces found")
-            return []
-        workspace_id = workspaces[0]["gid"]
-    
-    result = api_request(f"/workspaces/{workspace_id}/users?opt_fields=name,email")
-    users = result.get("data", [])
+        print("No workspaces found")
+        return 0
+    users = get_client().list_users(workspace_id, fields, max_items)
     
+    if fmt:
+        return write_records(users, fmt, columns(fields, USER_FIELDS))
     print(f"Users in workspace {workspace_id}:")
+    count = 0
     for user in users:
-        print(f"  [{user['gid']}] {user.get('name')} ({user.get('email', '')})")
+        if fields:
+            print(format_row(user, fields))
+        else:
+            print(f"  [{user['gid']}] {user.get('name')} ({user.get('email', '')})")
+        count += 1
     
-    return users
+    return count
+
+
+# ============== BULK OPERATIONS ==============
+
+# Tasks in flight per worker while streaming IDs from stdin.
+BULK_IN_FLIGHT_PER_WORKER = 4
+GID = re.compile(r"\d+")
+TASK_ID_IN_ROW = re.compile(r"\[(\d+)\]")
+LEADING_TASK_ID = re.compile(r"(\d+)[\t,]")
+# "1000,1001": a comma-separated list of IDs, split like a command-line argument.
+GID_LIST = re.compile(r"\d+(?:\s*,\s*\d*)+")
+# Human headings ("Tasks in project 1:") and footers ("(12 subtasks)") carry no ID.
+NON_ROW_LINE = re.compile(r".*:|\(.*\)")
+
+
+def split_row(text: str, delimiter: str) -> list:
+    if delimiter == "\t":
+        return text.split("\t")  # --format tsv is unquoted
+    return next(csv.reader([text]))
+
+
+def iter_stdin_task_ids(lines):
+    """Yield task IDs from piped output of the read commands.
+    
+    Accepts bare IDs, comma-separated ID lists, human rows ("  ○ [123] Name | ..."),
+    NDJSON/JSON records with a "gid", and CSV/TSV rows (the gid column named by a
+    header, else the first column). Lines that hold no ID are reported on stderr
+    and skipped.
+    """
+    gid_column = None  # (delimiter, index) once a CSV/TSV header has been seen
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text in ("[", "]"):
+            continue
+        gid = None
+        if text.startswith("{"):
+            try:
+                gid = str(json.loads(text.rstrip(",")).get("gid") or "")
+            except (ValueError, AttributeError):
+                pass
+        elif GID.fullmatch(text):
+            gid = text
+        elif not gid_column and GID_LIST.fullmatch(text):
+            yield from (task_id.strip() for task_id in text.split(",") if task_id.strip())
+            continue
+        elif gid_column:
+            cells = split_row(text, gid_column[0])
+            gid = cells[gid_column[1]] if len(cells) > gid_column[1] else None
+        else:
+            header = next((d for d in ("\t", ",") if "gid" in split_row(text, d)), None)
+            if header:
+                gid_column = (header, split_row(text, header).index("gid"))
+                continue
+            match = LEADING_TASK_ID.match(text) or TASK_ID_IN_ROW.search(text)
+            gid = match.group(1) if match else None
+            if not gid and NON_ROW_LINE.fullmatch(text):
+                continue
+        if gid and GID.fullmatch(gid):
+            yield gid
+        else:
+            print(f"⚠ stdin line {number}: no task ID found: {text[:80]}", file=sys.stderr)
+
+
+def iter_task_ids(specs):
+    """Yield task IDs from arguments: plain IDs, comma-separated lists, or - for stdin."""
+    for spec in specs:
+        if spec == "-":
+            yield from iter_stdin_task_ids(sys.stdin)
+        else:
+            yield from (task_id for task_id in spec.split(",") if task_id)
+
+
+def task_mutation(cmd, task_id, extra=None):
+    """Return (method, endpoint, data, message) for one task of a mutating command."""
+    if cmd == "complete-task":
+        return "PUT", f"/tasks/{task_id}", {"completed": True}, f"Task {task_id} marked as complete"
+    if cmd == "incomplete-task":
+        return "PUT", f"/tasks/{task_id}", {"completed": False}, f"Task {task_id} marked as incomplete"
+    if cmd == "assign-task":
+        return "PUT", f"/tasks/{task_id}", {"assignee": extra}, f"Task {task_id} assigned to user {extra}"
+    if cmd == "unassign-task":
+        return "PUT", f"/tasks/{task_id}", {"assignee": None}, f"Task {task_id} unassigned"
+    return "POST", f"/tasks/{task_id}/stories", {"text": extra}, f"Comment added to task {task_id}"
+
+
+def bulk_results(cmd, task_ids, extra, concurrency):
+    """Apply a mutation to each task with bounded parallelism; yield (message, error) in input order."""
+    client = get_client()
+    
+    def apply(task_id):
+        method, endpoint, data, message = task_mutation(cmd, task_id, extra)
+        try:
+            client.request(f"{endpoint}?{WRITE_FIELDS}", method, data)
+            return message, None
+        except (APIError, *NETWORK_ERRORS) as e:
+            return task_id, describe_error(e)
+    
+    window = concurrency * BULK_IN_FLIGHT_PER_WORKER
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = deque()
+        for task_id in task_ids:
+            in_flight.append(executor.submit(apply, task_id))
+            if len(in_flight) >= window:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def bulk_results_batched(cmd, task_ids, extra, concurrency):
+    """Like bulk_results, but packs up to 10 mutations into each /batch request."""
+    queue = BatchQueue(get_client().token)
+    task_ids = iter(task_ids)
+    while True:
+        chunk = list(islice(task_ids, MAX_BATCH_ACTIONS * concurrency))
+        if not chunk:
+            return
+        messages = {}
+        for task_id in chunk:
+            method, endpoint, data, message = task_mutation(cmd, task_id, extra)
+            messages[task_id] = message
+            queue.add(method, f"{endpoint}?{WRITE_FIELDS}", data, key=task_id)
+        for result in queue.flush(concurrency):
+            if result.ok:
+                yield messages[result.key], None
+            elif result.status:
+                yield result.key, f"API Error {result.status}: {result.error}"
+            else:
+                yield result.key, result.error  # network error, already described
+
+
+def bulk_mutate(cmd, specs, extra=None, concurrency=8, batch_api=False):
+    """Run a mutating command over many tasks, reporting each and summarizing failures.
+    
+    Exits with status 1 if any task failed, after every task has been tried,
+    or if the arguments and stdin named no task at all.
+    """
+    task_ids = iter_task_ids(specs)
+    run = bulk_results_batched if batch_api else bulk_results
+    done, failed = 0, []
+    for message, error in run(cmd, task_ids, extra, max(1, concurrency)):
+        if error:
+            failed.append(message)
+            print(f"✗ {message}: {error}")
+        else:
+            done += 1
+            print(f"✓ {message}")
+    
+    if not done and not failed:
+        print("No task IDs given (nothing recognizable on stdin?)")
+        sys.exit(1)
+    print(f"{done}/{done + len(failed)} tasks updated.", end="")
+    if failed:
+        shown = ", ".join(failed[:20]) + (", ..." if len(failed) > 20 else "")
+        print(f" {len(failed)} failed: {shown}")
+        sys.exit(1)
+    print()
+    return done
 
 
 # ============== MAIN ==============
 
+def pop_option(args, name, type=str, default=None):
+    """Remove `name value` (or `name=value`) from args and return the value."""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return type(value)
+        if arg.startswith(name + "="):
+            del args[i]
+            return type(arg.split("=", 1)[1])
+    return default
+
+
+def pop_flag(args, name):
+    """Remove a boolean flag from args; return whether it was present."""
+    if name in args:
+        args.remove(name)
+        return True
+    return False
+
+
 def print_help():
     """Print help message."""
     help_text = """
@@ -320,35 +581,153 @@ TASK COMMANDS:
   assign-task <task_id> <user_gid>      Assign task to user
   unassign-task <task_id>               Unassign task
   add-comment <task_id> <text>          Add comment to task
+  get-stories <task_id>                 Show comments (--since 2025-06-01 filters by
+                                        creation time; --new shows only comments
+                                        added since the last --new call)
   create-task <project_id> <name>       Create new task
   get-subtasks <task_id>                List subtasks
+  get-subtasks <task_id> --recursive    Whole subtask tree, fetched level by level in
+                                        parallel (--concurrency); --depth N limits
+                                        the levels, --format adds depth and parent
   create-subtask <task_id> <name>       Create subtask
 
 PROJECT COMMANDS:
   list-tasks <project_id>               List tasks in project
-  list-projects [workspace_id]          List projects
+  list-tasks <project_id> --local       List tasks from the local mirror
+  sync-project <project_id>             Update the local mirror (full load once,
+                                        then Events API deltas)
+  sync-project <project_id> --comments  Also index task comments for --local search
+  list-projects [workspace_id]          List projects (default: --workspace, then
+                                        ASANA_WORKSPACE, then your first workspace)
 
 SEARCH:
-  search <workspace_id> <query>         Search tasks
+  search <workspace_id> <query>         Search tasks (default: 20 results)
+  search <workspace_id> <query> --local Ranked full-text search of mirrored
+                                        projects (names, notes, comments)
+
+BULK (complete-task, incomplete-task, unassign-task, assign-task, add-comment):
+  complete-task <id> <id> ...           Several IDs as arguments
+  complete-task <id>,<id>,...           Comma-separated IDs
+  list-tasks <project_id> | complete-task -
+                                        IDs from stdin (bare IDs or list rows)
+  assign-task <id>... <user_gid>        The last argument is the user
+  add-comment <id>,<id>|- <text>        The first argument holds the IDs
+  --concurrency N                       Parallel requests (default: 8)
+  --batch-api                           Pack up to 10 updates per /batch request
+                                        Every ID is tried; failures are summarized
+                                        at the end and the exit status is 1
 
 USER COMMANDS:
-  me                                    Get current user info
+  me                                    Get current user info (kept for 24h in the
+                                        identity cache; --refresh re-fetches)
   list-users [workspace_id]             List users in workspace
+
+OPTIONS:
+  --max N                               Stop listing after N rows (list/search commands).
+                                        Lists follow every page by default.
+  --fields a,b.c                        Fetch and print only these fields (get-task,
+                                        get-subtasks, get-stories, list-*, search, me).
+                                        Dotted paths reach into records, e.g.
+                                        assignee.name,custom_fields.display_value
+  --format json|ndjson|csv|tsv          Machine-readable output for the read commands
+                                        (get-task, get-subtasks, get-stories, list-*,
+                                        search, me), written as pages stream in.
+                                        CSV/TSV columns: gid + defaults, or --fields
+  --cache                               Serve get-task, get-subtasks, list-projects,
+                                        list-users and me from the local response cache
+                                        (or set ASANA_CACHE=1)
+  --no-cache                            Bypass the cache even if ASANA_CACHE=1
+  --refresh                             Re-fetch and overwrite cached responses
+  --workspace GID                       Workspace for list-projects, list-users and
+                                        search (then: search <query>)
+  --trace                               Print a per-request timeline and a summary
+                                        table (by method and endpoint) to stderr
+  --metrics-out PATH                    Write request metrics: JSON for *.json,
+                                        otherwise a Prometheus textfile
+
+PERSISTENT MODE:
+  serve [socket_path]                   Answer commands on a Unix socket, keeping the
+                                        connection, token and caches warm
+                                        (default: $ASANA_SOCKET or <cache dir>/asana.sock)
+  shell                                 Read commands from stdin, one per line
+  asana_cmd.py <command> [args]         Thin client: forwards to the server, or runs
+                                        in-process when none is running
 """
     print(help_text)
 
 
-def main():
-    if len(sys.argv) < 2:
+def is_bulk(id_args):
+    """True when ID arguments name more than one task or read them from stdin."""
+    return len(id_args) > 1 or any(arg == "-" or "," in arg for arg in id_args)
+
+
+def run_command(argv):
+    """Run one command line (without the script name)."""
+    argv = list(argv)
+    trace = pop_flag(argv, "--trace")
+    metrics_out = pop_option(argv, "--metrics-out")
+    if not (trace or metrics_out):
+        dispatch(argv)
+        return
+    start_tracing()
+    try:
+        dispatch(argv)
+    finally:
+        finish_tracing(trace, metrics_out)
+
+
+def dispatch(argv):
+    """Run one command, turning library errors into a message and exit status 1."""
+    try:
+        run(argv)
+    except APIError as e:
+        print(f"API Error {e.status}: {e.body}")
+        sys.exit(1)
+
+
+def run(argv):
+    """Parse the remaining options and run the command."""
+    if not argv:
         print_help()
         sys.exit(1)
     
-    cmd = sys.argv[1]
-    args = sys.argv[2:]
+    cmd = argv[0]
+    args = list(argv[1:])
+    max_items = pop_option(args, "--max", type=int)
+    concurrency = pop_option(args, "--concurrency", type=int, default=8)
+    batch_api = pop_flag(args, "--batch-api")
+    fields = pop_option(args, "--fields", type=parse_fields)
+    local = pop_flag(args, "--local")
+    workspace = pop_option(args, "--workspace")
+    recursive = pop_flag(args, "--recursive")
+    depth = pop_option(args, "--depth", type=int)
+    fmt = pop_option(args, "--format")
+    if pop_flag(args, "--ndjson"):
+        fmt = fmt or "ndjson"
+    if fmt and fmt not in FORMATS:
+        print(f"Unknown format: {fmt} (choose from {', '.join(FORMATS)})")
+        sys.exit(1)
+    since = pop_option(args, "--since")
+    new = pop_flag(args, "--new")
+    comments = pop_flag(args, "--comments") or None
+    
+    refresh = pop_flag(args, "--refresh")
+    if pop_flag(args, "--no-cache"):
+        configure_response_cache(False)
+    elif pop_flag(args, "--cache") or refresh:
+        configure_response_cache(True, refresh)
+    if refresh:
+        get_identity_cache().invalidate(get_client().token)
     
     # Task commands
     if cmd == "get-task" and len(args) >= 1:
-        get_task(args[0])
+        get_task(args[0], fields, fmt)
+    elif cmd in ("complete-task", "incomplete-task", "unassign-task") and is_bulk(args):
+        bulk_mutate(cmd, args, None, concurrency, batch_api)
+    elif cmd == "assign-task" and len(args) >= 2 and is_bulk(args[:-1]):
+        bulk_mutate(cmd, args[:-1], args[-1], concurrency, batch_api)
+    elif cmd == "add-comment" and len(args) >= 2 and is_bulk(args[:1]):
+        bulk_mutate(cmd, args[:1], " ".join(args[1:]), concurrency, batch_api)
     elif cmd == "complete-task" and len(args) >= 1:
         complete_task(args[0])
     elif cmd == "incomplete-task" and len(args) >= 1:
@@ -362,32 +741,38 @@ def main():
     elif cmd == "add-comment" and len(args) >= 2:
         add_comment(args[0], " ".join(args[1:]))
     elif cmd == "get-stories" and len(args) >= 1:
-        get_stories(args[0])
+        get_stories(args[0], fields, max_items, since, new, fmt)
     elif cmd == "create-task" and len(args) >= 2:
         create_task(args[0], " ".join(args[1:]))
+    elif cmd == "get-subtasks" and len(args) >= 1 and (recursive or depth is not None):
+        get_subtask_tree(args[0], fields, depth, concurrency, fmt)
     elif cmd == "get-subtasks" and len(args) >= 1:
-        get_subtasks(args[0])
+        get_subtasks(args[0], fields, fmt)
     elif cmd == "create-subtask" and len(args) >= 2:
         create_subtask(args[0], " ".join(args[1:]))
     
     # Project commands
     elif cmd == "list-tasks" and len(args) >= 1:
-        limit = int(args[1]) if len(args) > 1 else 50
-        list_tasks(args[0], limit)
+        # Legacy positional limit: list-tasks <project_id> [max]
+        if len(args) > 1:
+            max_items = int(args[1])
+        list_tasks(args[0], max_items, local, fields, fmt)
+    elif cmd == "sync-project" and len(args) >= 1:
+        sync_project_mirror(args[0], comments)
     elif cmd == "list-projects":
-        workspace_id = args[0] if args else None
-        list_projects(workspace_id)
+        list_projects(args[0] if args else workspace, max_items, fields, fmt)
     
     # Search
+    elif cmd == "search" and workspace and len(args) >= 1:
+        search_tasks(workspace, " ".join(args), max_items or 20, fields, local, fmt)
     elif cmd == "search" and len(args) >= 2:
-        search_tasks(args[0], " ".join(args[1:]))
+        search_tasks(args[0], " ".join(args[1:]), max_items or 20, fields, local, fmt)
     
     # User commands
     elif cmd == "me":
-        get_me()
+        get_me(fields, fmt)
     elif cmd == "list-users":
-        workspace_id = args[0] if args else None
-        list_users(workspace_id)
+        list_users(args[0] if args else workspace, max_items, fields, fmt)
     
     elif cmd == "help" or cmd == "--help" or cmd == "-h":
         print_help()
@@ -398,5 +783,15 @@ def main():
         sys.exit(1)
 
 
+def main():
+    argv = sys.argv[1:]
+    if argv[:1] == ["serve"]:
+        serve(run_command, argv[1] if len(argv) > 1 else None)
+    elif argv[:1] == ["shell"]:
+        shell(run_command)
+    else:
+        run_command(argv)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Batch API support: packs queued mutations into /batch calls of up to 10
+actions each and maps every sub-response back to the item that queued it.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from asana_client import NETWORK_ERRORS, APIError, describe_error, get_scheduler, request_json
+
+MAX_BATCH_ACTIONS = 10
+MAX_ITEM_RETRIES = 3
+
+
+class BatchResult:
+    """Outcome of one queued action."""
+
+    def __init__(self, key, status: int, data=None, error: str = None):
+        self.key = key
+        self.status = status
+        self.data = data
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status < 400
+
+
+def error_message(body) -> str:
+    """Pull the first error message out of an Asana error body."""
+    if isinstance(body, dict):
+        errors = body.get("errors") or []
+        if errors:
+            return errors[0].get("message", str(errors[0]))
+    return str(body)
+
+
+class BatchQueue:
+    """Queue of actions flushed through POST /batch.
+
+    Results come back in the order actions were queued, each tagged with the
+    caller-supplied key.
+    """
+
+    def __init__(self, token: str, batch_size: int = MAX_BATCH_ACTIONS):
+        self.token = token
+        self.batch_size = min(batch_size, MAX_BATCH_ACTIONS)
+        self.actions = []
+
+    def __len__(self):
+        return len(self.actions)
+
+    def add(self, method: str, relative_path: str, data: dict = None, key=None):
+        """Queue a raw action. Returns its index in the result list."""
+        action = {"relative_path": relative_path, "method": method.lower()}
+        if data is not None:
+            action["data"] = data
+        self.actions.append((key if key is not None else len(self.actions), action))
+        return len(self.actions) - 1
+
+    def create_task(self, project_id: str, data: dict, key=None):
+        return self.add("POST", "/tasks", dict(data, projects=[project_id]), key)
+
+    def create_subtask(self, parent_task_id: str, data: dict, key=None):
+        return self.add("POST", f"/tasks/{parent_task_id}/subtasks", data, key)
+
+    def update_task(self, task_id: str, data: dict, key=None):
+        return self.add("PUT", f"/tasks/{task_id}", data, key)
+
+    def complete_task(self, task_id: str, completed: bool = True, key=None):
+        return self.update_task(task_id, {"completed": completed}, key)
+
+    def assign_task(self, task_id: str, user_gid: str = None, key=None):
+        return self.update_task(task_id, {"assignee": user_gid}, key)
+
+    def add_comment(self, task_id: str, text: str, key=None):
+        return self.add("POST", f"/tasks/{task_id}/stories", {"text": text}, key)
+
+    def add_dependencies(self, task_id: str, dependency_ids: list, key=None):
+        return self.add("POST", f"/tasks/{task_id}/addDependencies", {"dependencies": dependency_ids}, key)
+
+    def _send(self, chunk):
+        """Send one /batch request; returns a BatchResult per action."""
+        try:
+            result = request_json("/batch", self.token, "POST", {"actions": [a for _, a in chunk]})
+        except APIError as e:
+            return [BatchResult(key, e.status, error=e.body) for key, _ in chunk]
+        except NETWORK_ERRORS as e:
+            return [BatchResult(key, 0, error=describe_error(e)) for key, _ in chunk]
+        results = []
+        for (key, _), response in zip(chunk, result.get("data", [])):
+            status = response.get("status_code", 0)
+            body = response.get("body") or {}
+            if status >= 400:
+                results.append(BatchResult(key, status, error=error_message(body)))
+            else:
+                results.append(BatchResult(key, status, body.get("data")))
+        return results
+
+    def _send_with_retry(self, chunk):
+        """Send a chunk, re-sending only the actions that were individually throttled."""
+        results = self._send(chunk)
+        for _ in range(MAX_ITEM_RETRIES):
+            throttled = [i for i, r in enumerate(results) if r.status == 429]
+            if not throttled:
+                break
+            get_scheduler().pause(1.0)
+            retried = self._send([chunk[i] for i in throttled])
+            for i, result in zip(throttled, retried):
+                results[i] = result
+        return results
+
+    def flush(self, concurrency: int = 1):
+        """Send every queued action and yield BatchResults in queue order."""
+        actions, self.actions = self.actions, []
+        chunks = [actions[i:i + self.batch_size] for i in range(0, len(actions), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            for results in executor.map(self._send_with_retry, chunks):
+                yield from results
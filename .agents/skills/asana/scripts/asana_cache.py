@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Opt-in on-disk cache for read-only API responses.
+Entries are keyed by token fingerprint, endpoint and query (including
+opt_fields), expire after a per-resource TTL, and are evicted least recently
+used once the cache grows past its size bound.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from asana_config import cache_dir
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Cacheable GET paths and how long their responses stay fresh, in seconds.
+# Anything not listed here always goes to the network.
+RESOURCE_TTLS = [
+    (re.compile(r"/users/me"), 3600),
+    (re.compile(r"/workspaces/[^/]+/users"), 3600),
+    (re.compile(r"/workspaces/[^/]+/projects"), 600),
+    (re.compile(r"/tasks/[^/]+"), 60),
+    (re.compile(r"/tasks/[^/]+/subtasks"), 60),
+]
+
+TASK_PATH = re.compile(r"/tasks/([^/?]+)")
+
+
+def token_fingerprint(token: str) -> str:
+    """Short stable ID for a token, so caches never store the token itself."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def ttl_for(path: str):
+    """Return the TTL for a path, or None if it should not be cached."""
+    for pattern, ttl in RESOURCE_TTLS:
+        if pattern.fullmatch(path):
+            return ttl
+    return None
+
+
+def response_cache_path():
+    return cache_dir() / "responses.sqlite"
+
+
+class ResponseCache:
+    """SQLite-backed TTL + LRU cache of raw response bodies."""
+
+    def __init__(self, path=None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path or response_cache_path()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, path TEXT, body BLOB, size INTEGER,"
+            " expires REAL, accessed REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_path ON responses(path)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(token: str, endpoint: str):
+        """Return (key, path). Query parameters are sorted so equal requests share a key."""
+        parts = urlsplit(endpoint)
+        query = urlencode(sorted(parse_qsl(parts.query)))
+        return f"{token_fingerprint(token)} {parts.path}?{query}", parts.path
+
+    def get(self, token: str, endpoint: str):
+        """Return the cached body bytes, or None on a miss or expired entry."""
+        key, _ = self.make_key(token, endpoint)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body FROM responses WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, token: str, endpoint: str, body: bytes):
+        """Store a body if its path is cacheable, then evict down to max_bytes."""
+        key, path = self.make_key(token, endpoint)
+        ttl = ttl_for(path)
+        if ttl is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, path, body, len(body), now + ttl, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ).fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def invalidate_task(self, task_gid: str):
+        """Drop cached responses for a task, its sub-resources, and any subtask
+        listing that includes it."""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM responses WHERE path = ? OR path LIKE ?"
+                " OR (path LIKE '/tasks/%/subtasks' AND CAST(body AS TEXT) LIKE ?)",
+                (f"/tasks/{task_gid}", f"/tasks/{task_gid}/%", f'%"{task_gid}"%'),
+            )
+
+    def invalidate_for(self, endpoint: str, data=None):
+        """Invalidate whatever a mutating request may have changed."""
+        path = urlsplit(endpoint).path
+        if path == "/batch":
+            for action in (data or {}).get("actions", []):
+                self.invalidate_for(action.get("relative_path", ""), action.get("data"))
+            return
+        match = TASK_PATH.match(path)
+        if match:
+            self.invalidate_task(match.group(1))
+        parent = data.get("parent") if isinstance(data, dict) else None
+        if parent:
+            self.invalidate_task(parent)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the Asana scripts.
+Keeps a pool of persistent keep-alive connections to the API host so repeated
+calls skip the TCP+TLS handshake. Responses are gzip-compressed on the wire and
+decompressed as they are read. Safe to use from multiple threads.
+"""
+
+import http.client
+import json
+import random
+import select
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode, urlsplit
+
+from asana_cache import ResponseCache, response_cache_path
+from asana_config import get_config
+from asana_stream import RecordParser
+from asana_trace import get_tracer
+
+ASANA_API_BASE = "https://app.asana.com/api/1.0"
+
+# Asana allows 1500 requests/minute on paid plans (150 on free ones) and at most
+# 15 concurrent write requests. Override with ASANA_RATE_LIMIT / ASANA_MAX_CONCURRENCY.
+DEFAULT_RATE_LIMIT = 1500
+DEFAULT_MAX_CONCURRENCY = 15
+DEFAULT_MAX_RETRIES = 5
+
+# Bytes read from the socket at a time when streaming a response body.
+CHUNK_BYTES = 64 * 1024
+
+# Methods that are safe to resend after a 5xx.
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+# Errors that mean a pooled socket was closed by the server while idle.
+STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+# Failures to reach the API at all (refused, reset, timed out, garbled response).
+NETWORK_ERRORS = (OSError, http.client.HTTPException)
+
+
+class APIError(Exception):
+    """Non-2xx response from the Asana API."""
+
+    def __init__(self, status: int, body: str, headers=None):
+        super().__init__(f"API Error {status}: {body}")
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+def describe_error(error: Exception) -> str:
+    """One-line description of an APIError or network error for per-item reports."""
+    if isinstance(error, APIError):
+        return f"API Error {error.status}: {error.body}"
+    return f"{type(error).__name__}: {error}"
+
+
+class ResponseStream:
+    """Body of a pooled response, gunzipped as it is read.
+
+    The connection goes back to the pool once the body has been read to the
+    end; a stream closed early (e.g. --max reached mid-page) closes it instead.
+    """
+
+    def __init__(self, pool, conn, response):
+        self.pool = pool
+        self.conn = conn
+        self.response = response
+        encoding = (response.getheader("Content-Encoding") or "").lower()
+        self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding == "gzip" else None
+        self.complete = False
+        self.buffered = None
+        self.wire_bytes = 0
+
+    def chunks(self):
+        """Yield decompressed body chunks as they arrive."""
+        if self.buffered is not None:
+            yield self.buffered
+            return
+        try:
+            while True:
+                raw = self.response.read1(CHUNK_BYTES)
+                if not raw:
+                    break
+                self.wire_bytes += len(raw)
+                with self.pool._lock:
+                    self.pool.stats["bytes_in"] += len(raw)
+                if not self.decoder:
+                    yield raw
+                    continue
+                # Bound each decompressed chunk; highly compressible bodies
+                # would otherwise inflate a whole page at once.
+                while raw:
+                    data = self.decoder.decompress(raw, CHUNK_BYTES)
+                    raw = self.decoder.unconsumed_tail
+                    if data:
+                        yield data
+            if self.decoder:
+                tail = self.decoder.flush()
+                if tail:
+                    yield tail
+            # read1() leaves a fully read response open; closing it frees the
+            # connection for the next request without touching the socket.
+            self.response.close()
+            self.complete = True
+        finally:
+            self.close()
+
+    def read(self) -> bytes:
+        """Read the whole (decompressed) body."""
+        if self.buffered is None:
+            self.buffered = b"".join(self.chunks())
+        return self.buffered
+
+    def close(self):
+        conn, self.conn = self.conn, None
+        if conn is None:
+            return
+        if self.complete and not self.response.will_close:
+            self.pool._release(conn)
+        else:
+            conn.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive connections to a single host."""
+
+    def __init__(self, base_url: str, maxsize: int = 16, timeout: float = 30):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self.stats = {"connections": 0, "requests": 0, "reused": 0, "reconnects": 0, "bytes_in": 0}
+
+    def _new_connection(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        with self._lock:
+            self.stats["connections"] += 1
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    @staticmethod
+    def _dropped(conn) -> bool:
+        """True if the server has closed an idle socket (it reads as EOF)."""
+        if conn.sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _acquire(self):
+        """Return (connection, reused). Most recently used sockets go first.
+
+        Sockets the server already closed are discarded here, so a POST is
+        rarely sent on a dead connection (it could not be resent safely).
+        """
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._new_connection(), False
+            if not self._dropped(conn):
+                return conn, True
+            conn.close()
+            with self._lock:
+                self.stats["reconnects"] += 1
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None):
+        """Send a request and return (status, headers, body bytes)."""
+        status, response_headers, stream = self.open(method, path, body, headers)
+        return status, response_headers, stream.read()
+
+    def open(self, method: str, path: str, body: bytes = None, headers: dict = None):
+        """Send a request and return (status, headers, ResponseStream).
+
+        Error bodies are read up front, so a caller that retries never has to
+        drain the stream first.
+        """
+        url = self.base_path + path
+        while True:
+            conn, reused = self._acquire()
+            sent = False
+            try:
+                conn.request(method, url, body=body, headers=headers or {})
+                sent = True
+                response = conn.getresponse()
+            except STALE_ERRORS:
+                conn.close()
+                # The server dropped an idle socket; retry on a fresh one unless
+                # it may already have acted on a non-idempotent request.
+                if reused and (not sent or method in IDEMPOTENT_METHODS):
+                    with self._lock:
+                        self.stats["reconnects"] += 1
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            with self._lock:
+                self.stats["requests"] += 1
+                if reused:
+                    self.stats["reused"] += 1
+            stream = ResponseStream(self, conn, response)
+            if response.status >= 400:
+                stream.read()
+            return response.status, response.headers, stream
+
+
+class TokenBucket:
+    """Client-side request quota: `rate` tokens per minute, bursting to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate / 60.0
+        self.capacity = capacity or max(1.0, rate / 10.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on throttling and grows back by one per clean window."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.active = 0
+        self._clean = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self._clean += 1
+            if self._clean >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._clean = 0
+                self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._clean = 0
+
+
+def retry_after_seconds(headers, default: float = 1.0) -> float:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class Scheduler:
+    """Admits requests under the quota and concurrency limit, retrying 429s and 5xx.
+
+    A 429 pauses every thread until its Retry-After has passed, not just the
+    one that received it.
+    """
+
+    def __init__(self, rate_limit: float, max_concurrency: int, max_retries: int):
+        self.bucket = TokenBucket(rate_limit)
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.max_retries = max_retries
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"throttled": 0, "retries": 0}
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_if_paused(self):
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def send(self, method: str, send):
+        """Call send() -> (status, headers, payload) with throttling and retries."""
+        attempt = 0
+        while True:
+            self._wait_if_paused()
+            self.bucket.acquire()
+            with self.limiter:
+                status, headers, payload = send()
+
+            if status == 429:
+                self.limiter.on_throttle()
+                self.pause(retry_after_seconds(headers))
+                with self._lock:
+                    self.stats["throttled"] += 1
+            elif status >= 500 and method in IDEMPOTENT_METHODS:
+                time.sleep(min(30.0, 2 ** attempt * 0.5) * random.uniform(0.5, 1.5))
+            else:
+                if status < 400:
+                    self.limiter.on_success()
+                return status, headers, payload
+
+            if attempt >= self.max_retries:
+                return status, headers, payload
+            attempt += 1
+            with self._lock:
+                self.stats["retries"] += 1
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Return the process-wide Scheduler, sized from config."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            config = get_config()
+            _scheduler = Scheduler(
+                float(config.get("ASANA_RATE_LIMIT", DEFAULT_RATE_LIMIT)),
+                int(config.get("ASANA_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+                int(config.get("ASANA_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            )
+        return _scheduler
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(base_url: str = None) -> ConnectionPool:
+    """Return the process-wide pool for base_url (defaults to the configured API base)."""
+    base_url = base_url or get_config().get("ASANA_API_BASE", ASANA_API_BASE)
+    with _pools_lock:
+        pool = _pools.get(base_url)
+        if pool is None:
+            pool = _pools[base_url] = ConnectionPool(base_url)
+        return pool
+
+
+_response_cache = None
+_cache_enabled = None
+_cache_refresh = False
+
+
+def configure_response_cache(enabled: bool = None, refresh: bool = False):
+    """Turn the on-disk response cache on or off for this process.
+
+    enabled=None follows the ASANA_CACHE setting. With refresh=True cached
+    reads are skipped but fresh responses are still stored.
+    """
+    global _cache_enabled, _cache_refresh
+    _cache_enabled = enabled
+    _cache_refresh = refresh
+
+
+def open_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        max_bytes = get_config().get("ASANA_CACHE_MAX_BYTES")
+        _response_cache = ResponseCache(max_bytes=int(max_bytes)) if max_bytes else ResponseCache()
+    return _response_cache
+
+
+def get_response_cache():
+    """Return the shared ResponseCache, or None when caching is off."""
+    global _cache_enabled
+    if _cache_enabled is None:
+        _cache_enabled = get_config().get("ASANA_CACHE", "").lower() in ("1", "true", "yes", "on")
+    return open_response_cache() if _cache_enabled else None
+
+
+def get_invalidation_cache():
+    """Return the ResponseCache a write must invalidate, or None if there is none.
+
+    Other processes may read with --cache even when this one doesn't, so an
+    existing responses.sqlite is invalidated whatever the read opt-in.
+    """
+    cache = get_response_cache()
+    if cache is None and (_response_cache is not None or response_cache_path().exists()):
+        cache = open_response_cache()
+    return cache
+
+
+def request_headers(token: str) -> dict:
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+    if get_config().get("ASANA_GZIP", "1").lower() not in ("0", "false", "no", "off"):
+        headers["Accept-Encoding"] = "gzip"
+    return headers
+
+
+class Attempts:
+    """send() wrapper for Scheduler.send that counts tries and keeps the last stream."""
+
+    def __init__(self, pool, method: str, endpoint: str, body: bytes, headers: dict, read: bool):
+        self.open = lambda: pool.open(method, endpoint, body, headers)
+        self.read = read
+        self.count = 0
+        self.stream = None
+
+    def __call__(self):
+        self.count += 1
+        status, headers, self.stream = self.open()
+        if self.read:
+            return status, headers, self.stream.read()
+        return status, headers, self.stream
+
+
+def trace_request(tracer, method: str, endpoint: str, status: int, started: float,
+                  body: bytes, attempts: Attempts):
+    tracer.record(method, endpoint, status, started, len(body or b""),
+                  attempts.stream.wire_bytes if attempts.stream else 0, max(0, attempts.count - 1))
+
+
+def request_json(endpoint: str, token: str, method: str = "GET", data=None) -> dict:
+    """Make an Asana API request over the shared pool and decode the JSON body.
+
+    Throttled and transient failures are retried by the shared Scheduler;
+    raises APIError once retries are exhausted or for other non-2xx responses.
+    """
+    headers = request_headers(token)
+    tracer = get_tracer()
+    started = time.perf_counter()
+    cache = get_response_cache()
+    if cache and method == "GET" and not _cache_refresh:
+        cached = cache.get(token, endpoint)
+        if cached is not None:
+            if tracer:
+                tracer.record(method, endpoint, 200, started, bytes_in=len(cached), cached=True)
+            return json.loads(cached)
+
+    body = json.dumps({"data": data}).encode() if data else None
+    attempts = Attempts(get_pool(), method, endpoint, body, headers, read=True)
+    status, response_headers, payload = get_scheduler().send(method, attempts)
+    if tracer:
+        trace_request(tracer, method, endpoint, status, started, body, attempts)
+    if status >= 400:
+        raise APIError(status, payload.decode(errors="replace"), response_headers)
+    if method == "GET":
+        if cache:
+            cache.put(token, endpoint, payload)
+    else:
+        cache = get_invalidation_cache()
+        if cache:
+            cache.invalidate_for(endpoint, data)
+    return json.loads(payload) if payload else {}
+
+
+def paginate(request, endpoint: str, params: dict = None, page_size: int = 100, max_items: int = None):
+    """Yield records from a list endpoint, fetching the next page only when needed.
+
+    request is a callable taking an endpoint and returning the decoded response,
+    so each script keeps its own error handling.
+    """
+    params = dict(params or {})
+    yielded = 0
+    while True:
+        if max_items is not None:
+            params["limit"] = max(1, min(page_size, max_items - yielded))
+        else:
+            params["limit"] = page_size
+        result = request(f"{endpoint}?{urlencode(params)}")
+        for record in result.get("data", []):
+            yield record
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+        next_page = result.get("next_page")
+        if not next_page or not next_page.get("offset"):
+            return
+        params["offset"] = next_page["offset"]
+
+
+def paginate_search(request, endpoint: str, params: dict = None, page_size: int = 100, max_items: int = None):
+    """Yield task search results beyond a single page.
+
+    The search endpoint has no next_page, so results are sorted newest first
+    and each following page asks for tasks created before the last one seen.
+    """
+    params = dict(params or {}, sort_by="created_at", sort_ascending="false")
+    fields = params.get("opt_fields")
+    if fields and "created_at" not in fields.split(","):
+        params["opt_fields"] = f"{fields},created_at"
+    yielded = 0
+    while True:
+        if max_items is not None:
+            params["limit"] = max(1, min(page_size, max_items - yielded))
+        else:
+            params["limit"] = page_size
+        records = request(f"{endpoint}?{urlencode(params)}").get("data", [])
+        for record in records:
+            yield record
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+        if len(records) < params["limit"] or not records[-1].get("created_at"):
+            return
+        params["created_at.before"] = records[-1]["created_at"]
+
+
+def paginate_stream(token: str, endpoint: str, params: dict = None, page_size: int = 100, max_items: int = None):
+    """Like paginate(), but parse each page off the socket and yield records as they complete.
+
+    Memory stays at about one record however large the page. Raises APIError.
+    With the response cache on, pages go through request_json so they are cached.
+    """
+    if get_response_cache():
+        yield from paginate(lambda e: request_json(e, token), endpoint, params, page_size, max_items)
+        return
+    params = dict(params or {})
+    headers = request_headers(token)
+    pool = get_pool()
+    tracer = get_tracer()
+    yielded = 0
+    while True:
+        if max_items is not None:
+            params["limit"] = max(1, min(page_size, max_items - yielded))
+        else:
+            params["limit"] = page_size
+        page = f"{endpoint}?{urlencode(params)}"
+        started = time.perf_counter()
+        attempts = Attempts(pool, "GET", page, None, headers, read=False)
+        status, response_headers, stream = get_scheduler().send("GET", attempts)
+        if status >= 400:
+            if tracer:
+                trace_request(tracer, "GET", page, status, started, None, attempts)
+            raise APIError(status, stream.read().decode(errors="replace"), response_headers)
+        parser = RecordParser()
+        try:
+            for chunk in stream.chunks():
+                for record in parser.feed(chunk):
+                    yield record
+                    yielded += 1
+                    if max_items is not None and yielded >= max_items:
+                        return
+        finally:
+            stream.close()
+            if tracer:
+                # Latency covers the whole body, including time spent in the consumer.
+                trace_request(tracer, "GET", page, status, started, None, attempts)
+        next_page = parser.close().get("next_page")
+        if not next_page or not next_page.get("offset"):
+            return
+        params["offset"] = next_page["offset"]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Thin client for `asana_api.py serve`: forwards argv over the Unix socket and
+prints the streamed output. Without a running server it runs the command
+in-process, so it can replace asana_api.py anywhere.
+Usage: python3 asana_cmd.py <command> [args]
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+
+def default_socket() -> str:
+    """Socket path from the environment alone, so the fast path skips .env parsing."""
+    if os.environ.get("ASANA_SOCKET"):
+        return os.environ["ASANA_SOCKET"]
+    cache = os.environ.get("ASANA_CACHE_DIR") or Path.home() / ".cache" / "asana-skill"
+    return str(Path(cache) / "asana.sock")
+
+
+def connect():
+    """Return a socket connected to the server, or None if none is running."""
+    paths = [default_socket()]
+    if not os.path.exists(paths[0]):
+        # ASANA_SOCKET / ASANA_CACHE_DIR may only be set in a .env file.
+        from asana_config import socket_path
+
+        paths.append(str(socket_path()))
+    for path in paths:
+        sock = socket.socket(socket.AF_UNIX)
+        try:
+            sock.connect(path)
+            return sock
+        except OSError:
+            sock.close()
+    return None
+
+
+def forward(sock, argv: list) -> int:
+    """Send one command and copy its output to stdout; returns the exit code."""
+    request = {"argv": argv}
+    if "-" in argv[1:]:
+        # The server can't see our stdin; send it along for commands reading IDs from -.
+        request["stdin"] = sys.stdin.read()
+    sock.sendall(json.dumps(request).encode() + b"\n")
+    with sock.makefile("rb") as frames:
+        for line in frames:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+            elif "exit" in message:
+                return message["exit"]
+    print("ERROR: server closed the connection")
+    return 1
+
+
+def main():
+    sock = connect()
+    if sock is None:
+        import asana_api
+
+        asana_api.main()
+        return
+    with sock:
+        sys.exit(forward(sock, sys.argv[1:]))
+
+
+if __name__ == "__main__":
+    main()
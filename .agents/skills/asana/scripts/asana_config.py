@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Token and settings resolution shared by the Asana scripts.
+.env files are read once per process; call reload_config() to pick up edits.
+
+Precedence (first match wins):
+  1. Process environment
+  2. <skill>/.env
+  3. <skill>/scripts/.env
+  4. ~/.claude/skills/asana/.env
+  5. ~/.claude/skills/.env
+  6. ~/.claude/.env
+"""
+
+import os
+import threading
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+ENV_PATHS = [
+    SCRIPT_DIR.parent / ".env",
+    SCRIPT_DIR / ".env",
+    Path.home() / ".claude" / "skills" / "asana" / ".env",
+    Path.home() / ".claude" / "skills" / ".env",
+    Path.home() / ".claude" / ".env",
+]
+
+
+def parse_env_file(path: Path) -> dict:
+    """Parse KEY=VALUE lines, skipping blanks and comments."""
+    values = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                key, value = line.split("=", 1)
+                values[key.strip()] = value.strip().strip('"').strip("'")
+    return values
+
+
+class Config:
+    """Resolved settings snapshot. Environment variables override .env files."""
+
+    def __init__(self, env_paths=None, environ=None):
+        self.values = {}
+        self.sources = []
+        for env_path in env_paths if env_paths is not None else ENV_PATHS:
+            if env_path.is_file():
+                self.sources.append(env_path)
+                for key, value in parse_env_file(env_path).items():
+                    self.values.setdefault(key, value)
+        self.values.update(os.environ if environ is None else environ)
+
+    def get(self, key: str, default=None):
+        return self.values.get(key, default)
+
+    @property
+    def token(self):
+        return self.get("ASANA_PAT") or self.get("ASANA_TOKEN")
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config() -> Config:
+    """Return the process-wide Config, loading it on first use."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = Config()
+    return _config
+
+
+def reload_config() -> Config:
+    """Discard the cached Config and re-read the environment and .env files."""
+    global _config
+    with _config_lock:
+        _config = Config()
+    return _config
+
+
+def cache_dir() -> Path:
+    """Directory for on-disk caches (ASANA_CACHE_DIR, default ~/.cache/asana-skill)."""
+    path = Path(get_config().get("ASANA_CACHE_DIR") or Path.home() / ".cache" / "asana-skill")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def socket_path() -> Path:
+    """Unix socket for `asana_api.py serve` (ASANA_SOCKET, default <cache dir>/asana.sock)."""
+    return Path(get_config().get("ASANA_SOCKET") or cache_dir() / "asana.sock")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Dependency graph for batch specs.
+Spec entries name their prerequisites by title; plan_waves turns that into
+topological waves that can each be created in parallel, and link_dependencies
+wires the created GIDs together through batched addDependencies calls.
+"""
+
+from asana_batch import BatchQueue
+
+# Asana accepts at most 30 dependencies per addDependencies call.
+MAX_DEPENDENCIES_PER_ACTION = 30
+
+
+class DependencyCycle(ValueError):
+    """The spec's dependencies loop back on themselves; carries the entry indices in the cycle."""
+
+    def __init__(self, cycle: list):
+        super().__init__("Dependency cycle: " + " -> ".join(map(str, cycle)))
+        self.cycle = cycle
+
+
+def build_graph(tasks: list):
+    """Return (deps, unknown) for a list of spec entries.
+
+    deps[i] is the sorted list of entry indices task i depends on. Titles that
+    match no entry in the spec are returned in unknown as (index, title) pairs.
+    """
+    by_title = {}
+    for index, task in enumerate(tasks):
+        by_title.setdefault(task.get("title", "Untitled").strip(), []).append(index)
+
+    deps, unknown = [], []
+    for index, task in enumerate(tasks):
+        wanted = set()
+        for title in task.get("dependencies") or []:
+            matches = by_title.get(str(title).strip())
+            if matches:
+                wanted.update(matches)
+            else:
+                unknown.append((index, title))
+        wanted.discard(index)
+        deps.append(sorted(wanted))
+    return deps, unknown
+
+
+def find_cycle(deps: list, nodes: set) -> list:
+    """Return the indices of one cycle among nodes (all of which are on or behind a cycle)."""
+    node = min(nodes)
+    seen = []
+    while node not in seen:
+        seen.append(node)
+        node = next(d for d in deps[node] if d in nodes)
+    return seen[seen.index(node):] + [node]
+
+
+def plan_waves(deps: list) -> list:
+    """Group task indices into topological waves (Kahn's algorithm).
+
+    Every task's dependencies sit in earlier waves, so each wave can be created
+    in parallel. Raises DependencyCycle with the offending indices as the cycle.
+    """
+    remaining = {index: set(d) for index, d in enumerate(deps)}
+    waves = []
+    while remaining:
+        wave = sorted(index for index, d in remaining.items() if not d)
+        if not wave:
+            raise DependencyCycle(find_cycle(deps, set(remaining)))
+        waves.append(wave)
+        for index in wave:
+            del remaining[index]
+        done = set(wave)
+        for d in remaining.values():
+            d -= done
+    return waves
+
+
+def link_dependencies(token: str, links: dict, concurrency: int = 1):
+    """Add dependencies through /batch: links maps task GID -> prerequisite GIDs.
+
+    Yields a BatchResult per addDependencies action, keyed by task GID.
+    """
+    queue = BatchQueue(token)
+    for task_gid, dependency_gids in links.items():
+        for i in range(0, len(dependency_gids), MAX_DEPENDENCIES_PER_ACTION):
+            queue.add_dependencies(task_gid, dependency_gids[i:i + MAX_DEPENDENCIES_PER_ACTION], key=task_gid)
+    yield from queue.flush(concurrency)
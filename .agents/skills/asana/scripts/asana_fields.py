@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Custom field resolution for task creation.
+Field GIDs are looked up once per project and kept in a small on-disk LRU
+cache, so creates can send custom_fields inline instead of doing a GET and a
+PUT per task.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from asana_client import APIError, paginate, request_json
+from asana_config import cache_dir
+
+DEV_HOURS_FIELD = "Dev Hours"
+
+FIELD_CACHE_TTL = 24 * 3600
+FIELD_CACHE_MAX_ENTRIES = 256
+
+
+class FieldCache:
+    """LRU map of (scope, field name) -> field GID with a TTL, persisted as JSON.
+
+    A GID of None records that the field is not available for that scope.
+    """
+
+    def __init__(self, path=None, ttl: float = FIELD_CACHE_TTL, max_entries: int = FIELD_CACHE_MAX_ENTRIES):
+        self.path = path or cache_dir() / "field_gids.json"
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        try:
+            with open(self.path) as f:
+                self._entries.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _key(scope: str, name: str) -> str:
+        return f"{scope}|{name}"
+
+    def get(self, scope: str, name: str):
+        """Return (hit, gid). Expired entries count as misses."""
+        key = self._key(scope, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if time.time() - entry["at"] > self.ttl:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry["gid"]
+
+    def put(self, scope: str, name: str, gid):
+        key = self._key(scope, name)
+        with self._lock:
+            self._entries[key] = {"gid": gid, "at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def invalidate(self, scope: str = None):
+        """Drop every entry for scope, or the whole cache when scope is None."""
+        with self._lock:
+            if scope is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k.startswith(f"{scope}|")]:
+                    del self._entries[key]
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+_field_cache = None
+_field_cache_lock = threading.Lock()
+
+
+def get_field_cache() -> FieldCache:
+    """Return the process-wide FieldCache."""
+    global _field_cache
+    with _field_cache_lock:
+        if _field_cache is None:
+            _field_cache = FieldCache()
+        return _field_cache
+
+
+def find_project_field(token: str, project_gid: str, name: str, subtype: str = "number"):
+    """Look up a custom field GID in a project's custom field settings."""
+    settings = paginate(
+        lambda endpoint: request_json(endpoint, token),
+        f"/projects/{project_gid}/custom_field_settings",
+        {"opt_fields": "custom_field.name,custom_field.gid,custom_field.resource_subtype"},
+    )
+    for setting in settings:
+        field = setting.get("custom_field") or {}
+        if field.get("name") == name and field.get("resource_subtype") == subtype:
+            return field.get("gid")
+    return None
+
+
+def field_scope(project_gid: str = None, parent_gid: str = None) -> str:
+    """Cache scope: the project, or the parent task for subtasks."""
+    return f"project:{project_gid}" if project_gid else f"parent:{parent_gid}"
+
+
+def rejects_custom_fields(status: int, body: str) -> bool:
+    """True if an error response blames the custom_fields sent with a task.
+
+    Other 400s (e.g. invalid html_notes) say nothing about the cached field
+    GID, so they must not invalidate it.
+    """
+    return status == 400 and "custom_field" in (body or "").lower()
+
+
+def forget_field(project_gid: str = None, parent_gid: str = None, name: str = DEV_HOURS_FIELD):
+    """Invalidate a scope after the API rejected its cached field GID.
+
+    A negative entry is stored so later tasks don't re-send the rejected GID.
+    """
+    scope = field_scope(project_gid, parent_gid)
+    cache = get_field_cache()
+    cache.invalidate(scope)
+    cache.put(scope, name, None)
+
+
+def resolve_field(token: str, project_gid: str = None, parent_gid: str = None, name: str = DEV_HOURS_FIELD):
+    """Return the GID of a project's custom field, using the cache when possible.
+
+    Subtasks are resolved through the first project of their parent task.
+    """
+    scope = field_scope(project_gid, parent_gid)
+    cache = get_field_cache()
+    hit, gid = cache.get(scope, name)
+    if hit:
+        return gid
+
+    if not project_gid:
+        parent = request_json(f"/tasks/{parent_gid}?opt_fields=projects.gid", token).get("data", {})
+        projects = parent.get("projects") or []
+        project_gid = projects[0]["gid"] if projects else None
+    gid = find_project_field(token, project_gid, name) if project_gid else None
+    cache.put(scope, name, gid)
+    return gid
+
+
+def resolve_task_field(token: str, task_gid: str, name: str = DEV_HOURS_FIELD):
+    """Return (field GID, owner) for an existing task, for updates.
+
+    The task's first project (or, outside any project, its parent) is looked
+    up once and cached, so the field comes from the same per-project entry
+    that creates use. owner holds the project_gid/parent_gid keyword for
+    forget_field, or is empty when the task has neither.
+    """
+    cache = get_field_cache()
+    task_scope = f"task:{task_gid}"
+    hit, scope = cache.get(task_scope, "scope")
+    if not hit:
+        task = request_json(f"/tasks/{task_gid}?opt_fields=projects.gid,parent.gid", token).get("data", {})
+        projects = task.get("projects") or []
+        parent = task.get("parent") or {}
+        if projects:
+            scope = field_scope(project_gid=projects[0]["gid"])
+        elif parent.get("gid"):
+            scope = field_scope(parent_gid=parent["gid"])
+        cache.put(task_scope, "scope", scope)
+    if not scope:
+        return None, {}
+    kind, gid = scope.split(":", 1)
+    owner = {"project_gid": gid} if kind == "project" else {"parent_gid": gid}
+    return resolve_field(token, name=name, **owner), owner
+
+
+def create_with_fields(token: str, endpoint: str, data: dict, project_gid: str = None, parent_gid: str = None):
+    """POST a task with inline custom_fields. Returns (task, fields_applied).
+
+    If the error names the custom fields (e.g. the field was removed from the
+    project), the cached GID is invalidated and the task is created without them.
+    Other errors, including unrelated 400s, propagate as APIError.
+    """
+    try:
+        return request_json(endpoint, token, "POST", data).get("data", {}), "custom_fields" in data
+    except APIError as e:
+        if "custom_fields" not in data or not rejects_custom_fields(e.status, e.body):
+            raise
+    forget_field(project_gid, parent_gid)
+    data = {k: v for k, v in data.items() if k != "custom_fields"}
+    return request_json(endpoint, token, "POST", data).get("data", {}), False
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Current user and default workspace, resolved once per token.
+The /users/me response is kept on disk keyed by token fingerprint, so commands
+that default to "the first workspace" go straight to the request they need
+instead of asking /users/me first.
+"""
+
+import json
+import os
+import threading
+import time
+
+from asana_cache import token_fingerprint
+from asana_client import request_json
+from asana_config import cache_dir, get_config
+
+IDENTITY_FIELDS = "name,email,workspaces.name"
+IDENTITY_TTL = 24 * 3600
+
+
+class IdentityCache:
+    """Map of token fingerprint -> /users/me data with a TTL, persisted as JSON."""
+
+    def __init__(self, path=None, ttl: float = None):
+        self.path = path or cache_dir() / "identity.json"
+        self.ttl = ttl if ttl is not None else float(get_config().get("ASANA_IDENTITY_TTL", IDENTITY_TTL))
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(self.path) as f:
+                self._entries.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def get(self, token: str):
+        """Return the cached user, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(token_fingerprint(token))
+            if entry is None or time.time() - entry["at"] > self.ttl:
+                return None
+            return entry["user"]
+
+    def put(self, token: str, user: dict):
+        with self._lock:
+            self._entries[token_fingerprint(token)] = {"user": user, "at": time.time()}
+            self._save()
+
+    def invalidate(self, token: str = None):
+        """Forget one token's identity, or every identity when token is None."""
+        with self._lock:
+            if token is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(token_fingerprint(token), None)
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            # Names and e-mail addresses: readable by the owner only.
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+_identity_cache = None
+_identity_cache_lock = threading.Lock()
+
+
+def get_identity_cache() -> IdentityCache:
+    """Return the process-wide IdentityCache."""
+    global _identity_cache
+    with _identity_cache_lock:
+        if _identity_cache is None:
+            _identity_cache = IdentityCache()
+        return _identity_cache
+
+
+def current_user(token: str, refresh: bool = False) -> dict:
+    """The token's user with name, email and workspaces. Raises APIError."""
+    cache = get_identity_cache()
+    user = None if refresh else cache.get(token)
+    if user is None:
+        user = request_json(f"/users/me?opt_fields={IDENTITY_FIELDS}", token).get("data", {})
+        cache.put(token, user)
+    return user
+
+
+def default_workspace(token: str, refresh: bool = False):
+    """ASANA_WORKSPACE if set, else the user's first workspace (or None)."""
+    configured = get_config().get("ASANA_WORKSPACE")
+    if configured:
+        return configured
+    workspaces = current_user(token, refresh).get("workspaces") or []
+    return workspaces[0]["gid"] if workspaces else None
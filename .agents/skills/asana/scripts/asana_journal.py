@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Append-only checkpoint journal for batch task creation.
+Each line records the content hash of a spec entry and the GID Asana returned
+for it, so an interrupted run can be resumed without creating duplicates.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from asana_config import cache_dir
+
+
+def content_hash(target: str, name: str, notes: str, hours: float = None) -> str:
+    """Stable hash of what a spec entry would create under target."""
+    payload = json.dumps([target, name, notes, hours], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def default_journal_path(source: str, target: str):
+    """Journal for a spec file (or "-" for stdin) and target, under cache_dir()/journals.
+
+    Kept out of the spec's directory so runs don't leave files next to it.
+    """
+    source = source if source == "-" else os.path.abspath(source)
+    stem = "stdin" if source == "-" else os.path.splitext(os.path.basename(source))[0]
+    digest = hashlib.sha256(f"{source}\n{target}".encode()).hexdigest()[:12]
+    path = cache_dir() / "journals"
+    path.mkdir(exist_ok=True)
+    return path / f"{stem}-{digest}.journal.jsonl"
+
+
+class Journal:
+    """JSONL journal of created tasks for one target (parent task or project).
+
+    Entries are keyed by content hash plus an occurrence index, so identical
+    entries in one spec are tracked separately. A later {"removed": true}
+    line cancels an earlier entry.
+    """
+
+    def __init__(self, path, target: str):
+        self.path = path
+        self.target = target
+        self.done = {}
+        self._lock = threading.Lock()
+        line = ""
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    if entry.get("target") != target:
+                        continue
+                    if entry.get("removed"):
+                        self.done.pop(entry["key"], None)
+                    else:
+                        self.done[entry["key"]] = entry
+        except FileNotFoundError:
+            pass
+        self._file = open(path, "a")
+        if line and not line.endswith("\n"):
+            # End the torn line so the next record isn't appended onto it.
+            self._file.write("\n")
+            self._file.flush()
+
+    def lookup(self, key: str):
+        with self._lock:
+            return self.done.get(key)
+
+    def _append(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def record(self, key: str, gid: str, name: str):
+        entry = {"target": self.target, "key": key, "gid": gid, "name": name, "at": time.time()}
+        with self._lock:
+            self.done[key] = entry
+            self._append(entry)
+
+    def forget(self, key: str):
+        with self._lock:
+            entry = self.done.pop(key, None)
+            if entry:
+                self._append({"target": self.target, "key": key, "gid": entry["gid"], "removed": True})
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Importable client for the operations behind asana_api.py.
+AsanaClient returns records and raises exceptions instead of printing and
+exiting; AsyncAsanaClient exposes the same operations to asyncio code. Both
+go through the process-wide connection pool, retry scheduler and concurrency
+limits in asana_client, so any number of clients share one request budget.
+
+    from asana_lib import AsanaClient, AsyncAsanaClient
+
+    client = AsanaClient()                    # token from ASANA_PAT / .env
+    task = client.get_task("1201", fields=["name", "completed"])
+    for task in client.list_tasks("1200"):
+        ...
+
+    async with AsyncAsanaClient() as client:
+        tasks = await asyncio.gather(*(client.get_task(gid) for gid in gids))
+        async for story in client.get_stories("1201"):
+            ...
+"""
+
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Iterator, List, Optional, TypedDict
+
+from asana_client import APIError, paginate, paginate_search, paginate_stream, request_json
+from asana_config import get_config
+from asana_identity import current_user, default_workspace
+from asana_mirror import sync_project
+from asana_stories import new_stories
+from asana_tree import walk_subtasks
+
+__all__ = [
+    "APIError", "AsanaClient", "AsyncAsanaClient", "MissingTokenError", "NoWorkspaceError",
+    "Project", "Story", "Task", "User", "Workspace",
+]
+
+# Default opt_fields per operation: what asana_api.py prints for it.
+TASK_FIELDS = "name,completed,due_on,assignee.name,projects.name,notes"
+TASK_LIST_FIELDS = "name,completed,due_on,assignee.name"
+SUBTASK_FIELDS = "name,completed,assignee.name"
+SEARCH_FIELDS = "name,completed,assignee.name,projects.name"
+STORY_FIELDS = "created_at,created_by.name,text,resource_subtype"
+PROJECT_FIELDS = "name,archived"
+USER_FIELDS = "name,email"
+ME_FIELDS = "name,email,workspaces.name"
+
+# Mutations only need to know they succeeded.
+WRITE_FIELDS = "opt_fields=gid"
+
+# Worker threads behind AsyncAsanaClient, and records moved per thread hop
+# when iterating a listing.
+ASYNC_WORKERS = 32
+ASYNC_BATCH = 100
+
+
+class Workspace(TypedDict, total=False):
+    gid: str
+    name: str
+
+
+class User(TypedDict, total=False):
+    gid: str
+    name: str
+    email: str
+    workspaces: List[Workspace]
+
+
+class Project(TypedDict, total=False):
+    gid: str
+    name: str
+    archived: bool
+
+
+class Task(TypedDict, total=False):
+    gid: str
+    name: str
+    notes: str
+    completed: bool
+    due_on: Optional[str]
+    assignee: Optional[User]
+    projects: List[Project]
+    num_subtasks: int
+
+
+class Story(TypedDict, total=False):
+    gid: str
+    created_at: str
+    created_by: User
+    text: str
+    resource_subtype: str
+
+
+class MissingTokenError(RuntimeError):
+    """No personal access token was passed or configured."""
+
+
+class NoWorkspaceError(LookupError):
+    """No workspace was given and the user has no default workspace."""
+
+
+def opt_fields(fields, default: str) -> str:
+    """opt_fields value for a list of fields, a comma-separated string, or the default."""
+    if not fields:
+        return default
+    return fields if isinstance(fields, str) else ",".join(fields)
+
+
+class AsanaClient:
+    """Synchronous Asana client. Safe to share between threads.
+
+    Reads return records (dicts shaped like the TypedDicts above, holding the
+    requested fields); listings are lazy iterators that fetch pages on demand.
+    API failures raise APIError; a workspace-scoped call without a workspace
+    raises NoWorkspaceError when the user has none to default to.
+    """
+
+    def __init__(self, token: str = None):
+        self.token = token or get_config().token
+        if not self.token:
+            raise MissingTokenError("ASANA_PAT is not set")
+
+    def request(self, endpoint: str, method: str = "GET", data=None) -> dict:
+        """Raw API call; returns the decoded response body."""
+        return request_json(endpoint, self.token, method, data)
+
+    def _data(self, endpoint: str, method: str = "GET", data=None) -> dict:
+        return self.request(endpoint, method, data).get("data", {})
+
+    def _pages(self, endpoint: str, params: dict, max_items: int = None) -> Iterator[dict]:
+        return paginate(self.request, endpoint, params, max_items=max_items)
+
+    # ---- tasks ----
+
+    def get_task(self, task_id: str, fields=None) -> Task:
+        return self._data(f"/tasks/{task_id}?opt_fields={opt_fields(fields, TASK_FIELDS)}")
+
+    def update_task(self, task_id: str, **fields) -> Task:
+        """PUT the given task fields (name, notes, due_on, assignee, completed, ...)."""
+        return self._data(f"/tasks/{task_id}?{WRITE_FIELDS}", "PUT", fields)
+
+    def complete_task(self, task_id: str) -> Task:
+        return self.update_task(task_id, completed=True)
+
+    def incomplete_task(self, task_id: str) -> Task:
+        return self.update_task(task_id, completed=False)
+
+    def assign_task(self, task_id: str, user_gid: str) -> Task:
+        return self.update_task(task_id, assignee=user_gid)
+
+    def unassign_task(self, task_id: str) -> Task:
+        return self.update_task(task_id, assignee=None)
+
+    def add_comment(self, task_id: str, text: str) -> Story:
+        return self._data(f"/tasks/{task_id}/stories?{WRITE_FIELDS}", "POST", {"text": text})
+
+    def create_task(self, project_id: str, name: str, **fields) -> Task:
+        return self._data("/tasks?opt_fields=name", "POST", dict(fields, name=name, projects=[project_id]))
+
+    def create_subtask(self, parent_id: str, name: str, **fields) -> Task:
+        return self._data(f"/tasks/{parent_id}/subtasks?opt_fields=name", "POST", dict(fields, name=name))
+
+    def get_subtasks(self, task_id: str, fields=None) -> List[Task]:
+        return list(self._pages(f"/tasks/{task_id}/subtasks", {"opt_fields": opt_fields(fields, SUBTASK_FIELDS)}))
+
+    def walk_subtasks(self, task_id: str, fields=None, depth: int = None, concurrency: int = 8):
+        """Yield (depth, parent_gid, Task) for the whole subtask tree, in tree order."""
+        return walk_subtasks(self.token, task_id, opt_fields(fields, SUBTASK_FIELDS), depth, concurrency)
+
+    def get_stories(self, task_id: str, fields=None, max_items: int = None, since: str = None) -> Iterator[Story]:
+        """Stories oldest first, parsed as they stream in; since keeps those created at or after it."""
+        fields = opt_fields(fields, STORY_FIELDS)
+        if since and "created_at" not in fields.split(","):
+            fields += ",created_at"
+        stories = paginate_stream(self.token, f"/tasks/{task_id}/stories", {"opt_fields": fields},
+                                  max_items=None if since else max_items)
+        if since:
+            stories = islice((s for s in stories if s.get("created_at", "") >= since), max_items)
+        return stories
+
+    def new_stories(self, task_id: str, fields=None) -> List[Story]:
+        """Stories added since the previous new_stories() call for this task (see asana_stories)."""
+        return new_stories(self.token, task_id, opt_fields(fields, STORY_FIELDS))
+
+    # ---- projects ----
+
+    def list_tasks(self, project_id: str, fields=None, max_items: int = None) -> Iterator[Task]:
+        return paginate_stream(self.token, f"/projects/{project_id}/tasks",
+                               {"opt_fields": opt_fields(fields, TASK_LIST_FIELDS)}, max_items=max_items)
+
+    def list_projects(self, workspace_id: str = None, fields=None, max_items: int = None) -> Iterator[Project]:
+        """Unarchived projects of a workspace (default: default_workspace())."""
+        workspace_id = workspace_id or self.require_workspace()
+        return self._pages(f"/workspaces/{workspace_id}/projects",
+                           {"opt_fields": opt_fields(fields, PROJECT_FIELDS), "archived": "false"}, max_items)
+
+    def sync_project(self, project_id: str, comments: bool = None) -> dict:
+        """Update the local SQLite mirror of a project; returns the sync summary."""
+        return sync_project(self.token, project_id, comments=comments)
+
+    def search_tasks(self, workspace_id: str, query: str, fields=None, max_items: int = 20) -> Iterator[Task]:
+        return paginate_search(self.request, f"/workspaces/{workspace_id}/tasks/search",
+                               {"text": query, "opt_fields": opt_fields(fields, SEARCH_FIELDS)}, max_items=max_items)
+
+    # ---- users ----
+
+    def me(self, fields=None, refresh: bool = False) -> User:
+        """The token's user. Default fields come from the on-disk identity cache."""
+        if fields:
+            return self._data(f"/users/me?opt_fields={opt_fields(fields, ME_FIELDS)}")
+        return current_user(self.token, refresh)
+
+    def default_workspace(self) -> Optional[str]:
+        """ASANA_WORKSPACE, else the user's first workspace, else None."""
+        return default_workspace(self.token)
+
+    def require_workspace(self) -> str:
+        workspace_id = self.default_workspace()
+        if not workspace_id:
+            raise NoWorkspaceError("No workspaces found")
+        return workspace_id
+
+    def list_users(self, workspace_id: str = None, fields=None, max_items: int = None) -> Iterator[User]:
+        workspace_id = workspace_id or self.require_workspace()
+        return self._pages(f"/workspaces/{workspace_id}/users",
+                           {"opt_fields": opt_fields(fields, USER_FIELDS)}, max_items)
+
+
+# Operations AsyncAsanaClient exposes as coroutines and as async iterators.
+ASYNC_CALLS = (
+    "request", "get_task", "update_task", "complete_task", "incomplete_task", "assign_task",
+    "unassign_task", "add_comment", "create_task", "create_subtask", "get_subtasks", "new_stories",
+    "sync_project", "me", "default_workspace",
+)
+ASYNC_ITERATORS = ("walk_subtasks", "get_stories", "list_tasks", "list_projects", "search_tasks", "list_users")
+
+
+class AsyncAsanaClient:
+    """asyncio front end to AsanaClient with the same operations.
+
+    Single-record operations are coroutines; listings are async iterators.
+    Calls run on a private thread pool while the shared scheduler enforces
+    the rate and concurrency limits, so hundreds of concurrent coroutines
+    queue for their turn instead of flooding the API.
+    """
+
+    def __init__(self, token: str = None, max_workers: int = ASYNC_WORKERS):
+        self.sync = AsanaClient(token)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asana")
+        self._closed = False
+        self._iterators = weakref.WeakSet()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close listings left unfinished (releasing their connections), then the pool."""
+        for iterator in list(self._iterators):
+            await iterator.aclose()
+        self.close()
+
+    def close(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def _iterate(self, fn, *args, **kwargs):
+        records = await self._run(lambda: iter(fn(*args, **kwargs)))
+        try:
+            while True:
+                batch = await self._run(lambda: list(islice(records, ASYNC_BATCH)))
+                for record in batch:
+                    yield record
+                if len(batch) < ASYNC_BATCH:
+                    return
+        finally:
+            close = getattr(records, "close", None)
+            if close and self._closed:
+                close()  # finalized after close(): the executor is gone
+            elif close:
+                await self._run(close)
+
+
+def _async_call(name):
+    async def call(self, *args, **kwargs):
+        return await self._run(getattr(self.sync, name), *args, **kwargs)
+
+    call.__name__ = name
+    call.__doc__ = getattr(AsanaClient, name).__doc__
+    return call
+
+
+def _async_iterator(name):
+    def iterate(self, *args, **kwargs):
+        iterator = self._iterate(getattr(self.sync, name), *args, **kwargs)
+        self._iterators.add(iterator)
+        return iterator
+
+    iterate.__name__ = name
+    iterate.__doc__ = getattr(AsanaClient, name).__doc__
+    return iterate
+
+
+for _name in ASYNC_CALLS:
+    setattr(AsyncAsanaClient, _name, _async_call(_name))
+for _name in ASYNC_ITERATORS:
+    setattr(AsyncAsanaClient, _name, _async_iterator(_name))
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Local SQLite mirror of project tasks, kept current through the Events API.
+The first sync does a full load; later syncs fetch only tasks named in
+/events?resource=<project>&sync=<token>, and fall back to a full resync
+when the token has expired.
+
+Task names, notes and (optionally) comments are indexed with FTS5 for
+offline, ranked search.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asana_client import APIError, paginate, request_json
+from asana_config import cache_dir
+
+MIRROR_FIELDS = "name,notes,completed,due_on,assignee.name,modified_at"
+STORY_FIELDS = "text,resource_subtype"
+FETCH_CONCURRENCY = 8
+
+# bm25 column weights for name, notes, comments: a hit in the title counts most.
+SEARCH_WEIGHTS = (10.0, 2.0, 1.0)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    gid TEXT NOT NULL,
+    project_gid TEXT NOT NULL,
+    name TEXT,
+    notes TEXT,
+    completed INTEGER,
+    due_on TEXT,
+    assignee_name TEXT,
+    modified_at TEXT,
+    data TEXT,
+    PRIMARY KEY (project_gid, gid)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    project_gid TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS projects (
+    gid TEXT PRIMARY KEY,
+    name TEXT,
+    comments INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS comments (
+    task_gid TEXT PRIMARY KEY,
+    text TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+    gid UNINDEXED, project_gid UNINDEXED, name, notes, comments,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last as a prefix."""
+    terms = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if not terms:
+        return '""'
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SyncExpired(Exception):
+    """The sync token is missing or too old; carries a fresh token."""
+
+    def __init__(self, token: str):
+        super().__init__("Sync token expired")
+        self.token = token
+
+
+class Mirror:
+    """Task mirror backed by a single SQLite file."""
+
+    def __init__(self, path=None):
+        self.path = path or cache_dir() / "mirror.sqlite"
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        if (self.db.execute("SELECT 1 FROM tasks LIMIT 1").fetchone()
+                and not self.db.execute("SELECT 1 FROM task_fts LIMIT 1").fetchone()):
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        """Index rows mirrored before the search index existed."""
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO task_fts SELECT t.gid, t.project_gid, t.name, t.notes, c.text"
+                " FROM tasks t LEFT JOIN comments c ON c.task_gid = t.gid")
+            self.db.commit()
+
+    # ---------- writes ----------
+
+    def upsert(self, project_gid: str, task: dict):
+        assignee = task.get("assignee") or {}
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (task["gid"], project_gid, task.get("name"), task.get("notes"),
+                 int(bool(task.get("completed"))), task.get("due_on"), assignee.get("name"),
+                 task.get("modified_at"), json.dumps(task)),
+            )
+            self.db.execute("DELETE FROM task_fts WHERE gid = ? AND project_gid = ?", (task["gid"], project_gid))
+            self.db.execute(
+                "INSERT INTO task_fts SELECT ?, ?, ?, ?, (SELECT text FROM comments WHERE task_gid = ?)",
+                (task["gid"], project_gid, task.get("name"), task.get("notes"), task["gid"]),
+            )
+
+    def set_comments(self, gid: str, texts: list):
+        """Store a task's comment text and re-index every mirrored copy of the task."""
+        text = "\n".join(texts)
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO comments VALUES (?, ?)", (gid, text))
+            self.db.execute("UPDATE task_fts SET comments = ? WHERE gid = ?", (text, gid))
+
+    def remove(self, project_gid: str, gid: str):
+        with self._lock:
+            self.db.execute("DELETE FROM tasks WHERE project_gid = ? AND gid = ?", (project_gid, gid))
+            self.db.execute("DELETE FROM task_fts WHERE project_gid = ? AND gid = ?", (project_gid, gid))
+            self.db.execute("DELETE FROM comments WHERE task_gid = ?"
+                            " AND NOT EXISTS (SELECT 1 FROM tasks WHERE gid = ?)", (gid, gid))
+
+    def clear_project(self, project_gid: str):
+        with self._lock:
+            self.db.execute("DELETE FROM tasks WHERE project_gid = ?", (project_gid,))
+            self.db.execute("DELETE FROM task_fts WHERE project_gid = ?", (project_gid,))
+            self.db.execute("DELETE FROM comments WHERE task_gid NOT IN (SELECT gid FROM tasks)")
+
+    def set_project(self, project_gid: str, name: str, comments: bool):
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO projects VALUES (?, ?, ?)",
+                            (project_gid, name, int(comments)))
+
+    def set_token(self, project_gid: str, token: str):
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                            (project_gid, token, time.time()))
+            self.db.commit()
+
+    # ---------- reads ----------
+
+    def get_token(self, project_gid: str):
+        row = self.db.execute("SELECT sync_token FROM sync_state WHERE project_gid = ?",
+                              (project_gid,)).fetchone()
+        return row[0] if row else None
+
+    def synced_at(self, project_gid: str):
+        row = self.db.execute("SELECT synced_at FROM sync_state WHERE project_gid = ?",
+                              (project_gid,)).fetchone()
+        return row[0] if row else None
+
+    def indexes_comments(self, project_gid: str) -> bool:
+        row = self.db.execute("SELECT comments FROM projects WHERE gid = ?", (project_gid,)).fetchone()
+        return bool(row and row[0])
+
+    def search(self, text: str, limit: int = 20, project_gid: str = None):
+        """Yield ranked matches across mirrored projects in the shape search prints.
+
+        Each row also carries a "snippet" of the best-matching column.
+        """
+        sql = (
+            "SELECT f.gid, t.name, t.completed, t.assignee_name, p.name, f.project_gid,"
+            " snippet(task_fts, -1, '[', ']', '…', 10)"
+            " FROM task_fts f JOIN tasks t ON t.gid = f.gid AND t.project_gid = f.project_gid"
+            " LEFT JOIN projects p ON p.gid = f.project_gid"
+            " WHERE task_fts MATCH ?" + (" AND f.project_gid = ?" if project_gid else "") +
+            " ORDER BY bm25(task_fts, 0, 0, ?, ?, ?) LIMIT ?"
+        )
+        params = [fts_query(text)] + ([project_gid] if project_gid else []) + [*SEARCH_WEIGHTS, limit]
+        seen = set()
+        for gid, name, completed, assignee_name, project_name, project, snippet in self.db.execute(sql, params):
+            if gid in seen:
+                continue  # a task mirrored under several projects is listed once
+            seen.add(gid)
+            yield {
+                "gid": gid,
+                "name": name,
+                "completed": bool(completed),
+                "assignee": {"name": assignee_name} if assignee_name else None,
+                "projects": [{"gid": project, "name": project_name or project}],
+                "snippet": snippet,
+            }
+
+    def iter_tasks(self, project_gid: str):
+        """Yield mirrored tasks in the shape list-tasks prints, oldest GID first.
+
+        GIDs are numeric strings, so ordering by length then text is numeric order;
+        rowid is not stable because INSERT OR REPLACE gives an updated row a new one.
+        """
+        rows = self.db.execute(
+            "SELECT gid, name, completed, due_on, assignee_name FROM tasks"
+            " WHERE project_gid = ? ORDER BY length(gid), gid", (project_gid,))
+        for gid, name, completed, due_on, assignee_name in rows:
+            yield {
+                "gid": gid,
+                "name": name,
+                "completed": bool(completed),
+                "due_on": due_on,
+                "assignee": {"name": assignee_name} if assignee_name else None,
+            }
+
+
+def fetch_events(token: str, project_gid: str, sync: str = None):
+    """Return events since `sync` as (events, new_sync, has_more).
+
+    Raises SyncExpired when the API answers 412, which it also does for the
+    very first call without a token.
+    """
+    endpoint = f"/events?resource={project_gid}"
+    if sync:
+        endpoint += f"&sync={sync}"
+    try:
+        result = request_json(endpoint, token)
+    except APIError as e:
+        if e.status != 412:
+            raise
+        try:
+            fresh = json.loads(e.body).get("sync")
+        except ValueError:
+            fresh = None
+        if not fresh:
+            raise
+        raise SyncExpired(fresh)
+    return result.get("data", []), result.get("sync"), result.get("has_more", False)
+
+
+def fetch_comments(token: str, task_gid: str) -> list:
+    """Text of every comment on a task, oldest first."""
+    stories = paginate(lambda endpoint: request_json(endpoint, token),
+                       f"/tasks/{task_gid}/stories", {"opt_fields": STORY_FIELDS})
+    return [s.get("text") or "" for s in stories if s.get("resource_subtype") == "comment_added"]
+
+
+def index_comments(mirror: Mirror, token: str, gids) -> int:
+    """Fetch and index comments for the given tasks in parallel."""
+    def fetch(gid):
+        try:
+            return fetch_comments(token, gid)
+        except APIError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    gids = list(gids)
+    count = 0
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        for gid, texts in zip(gids, executor.map(fetch, gids)):
+            if texts is not None:
+                mirror.set_comments(gid, texts)
+                count += 1
+    return count
+
+
+def full_load(mirror: Mirror, token: str, project_gid: str, comments: bool = False) -> int:
+    """Replace the project's rows with a fresh page-by-page listing."""
+    mirror.clear_project(project_gid)
+    project = request_json(f"/projects/{project_gid}?opt_fields=name", token).get("data", {})
+    mirror.set_project(project_gid, project.get("name"), comments)
+    count = 0
+    gids = []
+    tasks = paginate(lambda endpoint: request_json(endpoint, token),
+                     f"/projects/{project_gid}/tasks", {"opt_fields": MIRROR_FIELDS})
+    for task in tasks:
+        mirror.upsert(project_gid, task)
+        gids.append(task["gid"])
+        count += 1
+    if comments:
+        index_comments(mirror, token, gids)
+    return count
+
+
+def sync_project(token: str, project_gid: str, mirror: Mirror = None, comments: bool = None) -> dict:
+    """Bring the mirror of one project up to date. Returns a summary dict.
+
+    comments=True also indexes task comments from then on (starting with a
+    full load); None keeps the project's current setting.
+    """
+    mirror = mirror or Mirror()
+    sync = mirror.get_token(project_gid)
+    indexed = mirror.indexes_comments(project_gid)
+    if comments and not indexed:
+        sync = None  # backfill comments for every task
+    comments = indexed or bool(comments)
+    summary = {"mode": "incremental", "loaded": 0, "changed": 0, "removed": 0, "comments": 0}
+
+    changed, removed, discussed = set(), set(), set()
+    try:
+        if not sync:
+            fetch_events(token, project_gid)
+        while True:
+            events, sync, has_more = fetch_events(token, project_gid, sync)
+            for event in events:
+                resource = event.get("resource") or {}
+                parent = event.get("parent") or {}
+                if resource.get("resource_type") == "story" and parent.get("resource_type") == "task":
+                    discussed.add(parent.get("gid"))
+                    continue
+                if resource.get("resource_type") != "task":
+                    continue
+                gid = resource.get("gid")
+                if event.get("action") in ("removed", "deleted"):
+                    removed.add(gid)
+                    changed.discard(gid)
+                else:
+                    changed.add(gid)
+                    removed.discard(gid)
+                    if event.get("action") == "added":
+                        discussed.add(gid)  # may arrive with existing comments
+            if not has_more:
+                break
+    except SyncExpired as e:
+        # Take the new token before listing so nothing that changes during
+        # the load is missed on the next sync.
+        summary["mode"] = "full"
+        summary["loaded"] = full_load(mirror, token, project_gid, comments)
+        mirror.set_token(project_gid, e.token)
+        return summary
+
+    def fetch(gid):
+        try:
+            return request_json(f"/tasks/{gid}?opt_fields={MIRROR_FIELDS},projects.gid", token).get("data")
+        except APIError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    changed = list(changed)
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        for gid, task in zip(changed, executor.map(fetch, changed)):
+            in_project = task and any(p.get("gid") == project_gid for p in task.get("projects", []))
+            if in_project:
+                task.pop("projects", None)
+                mirror.upsert(project_gid, task)
+                summary["changed"] += 1
+            else:
+                removed.add(gid)
+    for gid in removed:
+        mirror.remove(project_gid, gid)
+    summary["removed"] = len(removed)
+    if comments:
+        summary["comments"] = index_comments(mirror, token, discussed - removed)
+    mirror.set_token(project_gid, sync)
+    return summary
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Machine-readable output for asana_api.py read commands (--format).
+Records are encoded as they stream in and reach stdout through a buffer,
+so a 50k-row export costs one write per BUFFER_BYTES instead of one
+print() per row.
+
+    json    one array (one object for single-record commands)
+    ndjson  one object per line
+    csv     header row, then one row per record
+    tsv     like csv, tab-separated and unquoted; tabs/newlines in values become spaces
+"""
+
+import csv
+import json
+import sys
+
+FORMATS = ("json", "ndjson", "csv", "tsv")
+BUFFER_BYTES = 64 * 1024
+
+TSV_SPACES = str.maketrans("\t\r\n", "   ")
+
+
+def tsv_cell(text: str) -> str:
+    if "\t" in text or "\n" in text or "\r" in text:
+        return text.translate(TSV_SPACES)
+    return text
+
+
+def scalar_text(value, json_literals: bool = False) -> str:
+    if json_literals and isinstance(value, bool):
+        return "true" if value else "false"
+    return "" if value is None else str(value)
+
+
+def field_value(record, path: str, json_literals: bool = False) -> str:
+    """Resolve a dotted field path for printing; lists are joined with ', '.
+
+    json_literals writes booleans as true/false, as the JSON formats do.
+    """
+    value = record
+    for part in path.split("."):
+        if isinstance(value, list):
+            return ", ".join(field_value(item, part, json_literals) for item in value)
+        value = value.get(part) if isinstance(value, dict) else None
+    if isinstance(value, list):
+        return ", ".join(field_value(item, "name", json_literals) if isinstance(item, dict)
+                         else scalar_text(item, json_literals) for item in value)
+    if isinstance(value, dict):
+        return value.get("name") or value.get("gid") or ""
+    return scalar_text(value, json_literals)
+
+
+def cell_getter(path: str):
+    """Function returning one CSV/TSV cell; plain string fields skip field_value."""
+    if "." in path:
+        return lambda record: field_value(record, path, json_literals=True)
+
+    def get(record):
+        value = record.get(path)
+        return value if type(value) is str else field_value(record, path, json_literals=True)
+    return get
+
+
+def columns(fields, default: str) -> list:
+    """CSV/TSV columns: the --fields paths, else gid plus the command's default opt_fields."""
+    return list(fields) if fields else ["gid"] + default.split(",")
+
+
+class BufferedOutput:
+    """File-like object that collects text and writes it out in large chunks."""
+
+    def __init__(self, out=None, size: int = BUFFER_BYTES):
+        self.out = out or sys.stdout
+        self.limit = size
+        self.buffer = []
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.out.write("".join(self.buffer))
+            self.buffer, self.size = [], 0
+        self.out.flush()
+
+
+class RecordWriter:
+    """Write records in one of FORMATS; use as a context manager.
+
+    columns picks the CSV/TSV cells (dotted paths); JSON formats write each
+    record as returned. The JSON array is only closed if no exception was
+    raised, so a failed export never looks complete.
+    """
+
+    def __init__(self, fmt: str, columns: list = None, out=None, single: bool = False):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format {fmt!r} (choose from {', '.join(FORMATS)})")
+        self.fmt = fmt
+        self.columns = columns or ["gid"]
+        self.single = single
+        self.out = BufferedOutput(out)
+        self.count = 0
+        self._cells = [cell_getter(column) for column in self.columns]
+        # One encoder for the whole run; json.dumps with options builds a new one per call.
+        self._encode = json.JSONEncoder(ensure_ascii=False).encode
+        self._csv = csv.writer(self.out, lineterminator="\n") if fmt == "csv" else None
+
+    def __enter__(self):
+        if self.fmt == "json" and not self.single:
+            self.out.write("[")
+        elif self._csv:
+            self._csv.writerow(self.columns)
+        elif self.fmt == "tsv":
+            self.out.write("\t".join(self.columns) + "\n")
+        return self
+
+    def write(self, record: dict):
+        if self.fmt in ("json", "ndjson"):
+            text = self._encode(record)
+            if self.fmt == "ndjson" or self.single:
+                self.out.write(text + "\n")
+            else:
+                self.out.write(("\n" if self.count == 0 else ",\n") + text)
+        elif self._csv:
+            self._csv.writerow([cell(record) for cell in self._cells])
+        else:
+            self.out.write("\t".join([tsv_cell(cell(record)) for cell in self._cells]) + "\n")
+        self.count += 1
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None and self.fmt == "json" and not self.single:
+            self.out.write("\n]\n" if self.count else "]\n")
+        self.out.flush()
+
+
+def write_records(records, fmt: str, columns: list = None, single: bool = False) -> int:
+    """Write every record from an iterable as it arrives; returns the count."""
+    with RecordWriter(fmt, columns, single=single) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Persistent mode for asana_api.py: `serve` answers commands on a Unix socket
+and `shell` reads them from stdin, so the interpreter, config, connection
+pool and caches stay warm between commands.
+
+Wire protocol (one JSON object per line): the client sends {"argv": [...]},
+plus "stdin" text for commands that read IDs from -; the server streams
+{"out": "..."} frames, then {"exit": <code>}.
+"""
+
+import io
+import json
+import os
+import shlex
+import socket
+import sys
+import threading
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+
+from asana_client import configure_response_cache
+from asana_config import reload_config, socket_path
+
+FRAME_BYTES = 16 * 1024
+
+
+class FrameWriter:
+    """File-like object that forwards command output to the client in frames."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.buffer = []
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= FRAME_BYTES:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.send({"out": "".join(self.buffer)})
+            self.buffer, self.size = [], 0
+
+    def send(self, message: dict):
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+        self.wfile.flush()
+
+
+def execute(run, argv: list, out, stdin: str = None) -> int:
+    """Run one command with its output sent to out; returns the exit code."""
+    # Flags like --cache only apply to the command that passed them.
+    configure_response_cache()
+    if argv == ["reload"]:
+        reload_config()
+        print("Configuration reloaded", file=out)
+        return 0
+    saved_stdin = sys.stdin
+    if stdin is not None:
+        sys.stdin = io.StringIO(stdin)
+    with redirect_stdout(out), redirect_stderr(out):
+        try:
+            run(argv)
+            return 0
+        except SystemExit as e:
+            if isinstance(e.code, str):
+                print(e.code)
+                return 1
+            return e.code or 0
+        except Exception:
+            traceback.print_exc()
+            return 1
+        finally:
+            sys.stdin = saved_stdin
+
+
+def serve(run, path=None):
+    """Answer commands on a Unix socket until interrupted.
+
+    Commands share process-wide state (stdout, cache flags), so they run one
+    at a time; connections queue on a lock while another command is running.
+    """
+    path = str(path or socket_path())
+    lock = threading.Lock()
+
+    class Handler(StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    argv = request["argv"]
+                except (ValueError, KeyError, TypeError):
+                    return
+                out = FrameWriter(self.wfile)
+                try:
+                    with lock:
+                        code = execute(run, argv, out, request.get("stdin"))
+                    out.flush()
+                    out.send({"exit": code})
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+    if os.path.exists(path):
+        # Refuse to take over a socket another server is still answering on.
+        probe = socket.socket(socket.AF_UNIX)
+        try:
+            probe.connect(path)
+            print(f"ERROR: a server is already listening on {path}")
+            sys.exit(1)
+        except OSError:
+            os.unlink(path)
+        finally:
+            probe.close()
+
+    # The server holds the token, so only the owner may connect.
+    old_umask = os.umask(0o077)
+    try:
+        server = ThreadingUnixStreamServer(path, Handler)
+    finally:
+        os.umask(old_umask)
+    server.daemon_threads = True
+    print(f"Serving on {path} (Ctrl-C to stop)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+def shell(run, stdin=None):
+    """Read one command per line from stdin and run it in this process."""
+    stdin = stdin or sys.stdin
+    interactive = stdin.isatty()
+    while True:
+        if interactive:
+            print("asana> ", end="", flush=True)
+        line = stdin.readline()
+        if not line:
+            break
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            continue
+        if not argv:
+            continue
+        if argv[0] in ("exit", "quit"):
+            break
+        execute(run, argv, sys.stdout)
+        sys.stdout.flush()
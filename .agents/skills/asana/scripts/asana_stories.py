@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Incremental story fetch for polling tasks.
+A per-task high-water mark (last story seen plus an Events API sync token) is
+kept on disk, so a repeat poll asks /events what was added and fetches just
+those stories instead of re-reading the whole history.
+"""
+
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asana_cache import token_fingerprint
+from asana_client import APIError, paginate_stream, request_json
+from asana_config import cache_dir
+from asana_mirror import SyncExpired, fetch_events
+
+FETCH_CONCURRENCY = 8
+
+
+def story_key(story: dict):
+    """Chronological sort key: created_at, then GID (numerically) for ties."""
+    gid = story.get("gid", "")
+    return story.get("created_at", ""), len(gid), gid
+
+
+class StoryMarks:
+    """SQLite table of (token fingerprint, task) -> sync token and last story seen."""
+
+    def __init__(self, path=None):
+        self.path = path or cache_dir() / "stories.sqlite"
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS marks ("
+            " fingerprint TEXT, task_gid TEXT, sync_token TEXT, created_at TEXT, story_gid TEXT,"
+            " PRIMARY KEY (fingerprint, task_gid))"
+        )
+
+    def get(self, token: str, task_gid: str):
+        """Return (sync_token, last_story) or None for a task never polled."""
+        row = self.db.execute(
+            "SELECT sync_token, created_at, story_gid FROM marks WHERE fingerprint = ? AND task_gid = ?",
+            (token_fingerprint(token), task_gid)).fetchone()
+        if row is None:
+            return None
+        return row[0], ({"created_at": row[1], "gid": row[2]} if row[2] else None)
+
+    def put(self, token: str, task_gid: str, sync: str, last: dict = None):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO marks VALUES (?, ?, ?, ?, ?)",
+                (token_fingerprint(token), task_gid, sync,
+                 (last or {}).get("created_at"), (last or {}).get("gid")))
+            self.db.commit()
+
+
+def added_story_gids(token: str, task_gid: str, sync: str):
+    """GIDs of stories added since sync, and the new sync token. Raises SyncExpired."""
+    gids = []
+    while True:
+        events, sync, has_more = fetch_events(token, task_gid, sync)
+        for event in events:
+            resource = event.get("resource") or {}
+            if resource.get("resource_type") == "story" and event.get("action") == "added":
+                gids.append(resource["gid"])
+        if not has_more:
+            return gids, sync
+
+
+def fetch_stories(token: str, gids: list, opt_fields: str) -> list:
+    """Fetch stories by GID in parallel; deleted ones are skipped."""
+    def fetch(gid):
+        try:
+            return request_json(f"/stories/{gid}?opt_fields={opt_fields}", token).get("data")
+        except APIError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        return [story for story in executor.map(fetch, gids) if story]
+
+
+def new_stories(token: str, task_gid: str, opt_fields: str, marks: StoryMarks = None) -> list:
+    """Stories on task_gid newer than the last call's high-water mark, oldest first.
+
+    The first call for a task returns its whole history. Later calls read
+    the task's events and fetch only added stories; if the sync token has
+    expired, the history is listed again and filtered by the mark. The mark
+    is advanced before returning. Raises APIError.
+    """
+    marks = marks or StoryMarks()
+    if "created_at" not in opt_fields.split(","):
+        opt_fields += ",created_at"
+    mark = marks.get(token, task_gid)
+    sync, last = mark if mark else (None, None)
+
+    stories = None
+    if sync:
+        try:
+            gids, sync = added_story_gids(token, task_gid, sync)
+            stories = fetch_stories(token, gids, opt_fields)
+        except SyncExpired as e:
+            sync = e.token
+    else:
+        # Take a token before listing so stories added meanwhile show up next time.
+        try:
+            fetch_events(token, task_gid)
+        except SyncExpired as e:
+            sync = e.token
+    if stories is None:
+        stories = list(paginate_stream(token, f"/tasks/{task_gid}/stories", {"opt_fields": opt_fields}))
+
+    if last:
+        stories = [story for story in stories if story_key(story) > story_key(last)]
+    stories.sort(key=story_key)
+    marks.put(token, task_gid, sync, stories[-1] if stories else last)
+    return stories
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Incremental parser for Asana list responses.
+Feeds on raw body bytes as they come off the socket and returns each element
+of the top-level "data" array as soon as it is complete, so a page is never
+held in memory as one string or one list.
+"""
+
+import json
+import re
+
+STRUCTURAL = re.compile(rb'[{}\[\]",:]')
+
+
+def string_end(buffer: bytearray, start: int, resume: int) -> int:
+    """Index just past the string opened at start, or -1 if it is not complete yet.
+
+    Scanning restarts at resume, so a long string split over many chunks is
+    only searched once.
+    """
+    j = max(start + 1, resume)
+    while True:
+        j = buffer.find(b'"', j)
+        if j < 0:
+            return -1
+        k = j - 1
+        while buffer[k] == 0x5C:  # count the backslashes before the quote
+            k -= 1
+        if (j - 1 - k) % 2 == 0:
+            return j + 1
+        j += 1
+
+
+class RecordParser:
+    """Split {"data": [record, ...], ...} into records while bytes arrive.
+
+    feed() returns the records completed by a chunk; close() returns the rest
+    of the envelope (next_page etc.) with "data" emptied. Bodies without a
+    top-level data array are parsed whole by close().
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.pos = 0
+        self.depth = 0
+        self.key = None
+        self.last_string = None
+        self.head = None        # envelope bytes before the data array
+        self.in_data = False
+        self.start = 0          # start of the current record inside buffer
+        self.resume = 0         # where to continue scanning an unfinished string
+
+    def feed(self, chunk: bytes) -> list:
+        buffer = self.buffer
+        buffer += chunk
+        records = []
+        while True:
+            match = STRUCTURAL.search(buffer, self.pos)
+            if not match:
+                self.pos = len(buffer)
+                break
+            i = match.start()
+            char = buffer[i]
+            if char == 0x22:  # '"'
+                end = string_end(buffer, i, self.resume)
+                if end < 0:
+                    self.pos = i  # string continues in the next chunk
+                    self.resume = len(buffer)
+                    break
+                self.resume = 0
+                if self.depth == 1:
+                    self.last_string = bytes(buffer[i + 1:end - 1])
+                self.pos = end
+                continue
+            self.pos = i + 1
+            if char == 0x3A:  # ':'
+                if self.depth == 1:
+                    self.key = self.last_string
+            elif char in (0x7B, 0x5B):  # '{' '['
+                self.depth += 1
+                if self.depth == 2 and char == 0x5B and self.key == b"data" and self.head is None:
+                    self.head = bytes(buffer[:i]) + b"[]"
+                    del buffer[:i + 1]
+                    self.pos = self.start = 0
+                    self.in_data = True
+            elif char in (0x7D, 0x5D):  # '}' ']'
+                self.depth -= 1
+                if self.in_data and self.depth == 1:
+                    self._take(records, i)
+                    del buffer[:i + 1]
+                    self.pos = 0
+                    self.in_data = False
+            elif char == 0x2C:  # ','
+                if self.in_data and self.depth == 2:
+                    self._take(records, i)
+                    del buffer[:i + 1]
+                    self.pos = self.start = 0
+                elif self.depth == 1:
+                    self.key = None
+        return records
+
+    def _take(self, records: list, end: int):
+        record = self.buffer[self.start:end].strip()
+        if record:
+            records.append(json.loads(record))
+
+    def close(self) -> dict:
+        if self.head is None:
+            return json.loads(self.buffer) if self.buffer.strip() else {}
+        return json.loads(self.head + bytes(self.buffer))
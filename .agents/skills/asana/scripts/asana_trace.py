@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Per-request instrumentation for the Asana client.
+When tracing is on, every API call records its method, endpoint template,
+status, latency, bytes sent/received and retry count. The records can be
+printed as a timeline plus summary table (--trace) or written out as JSON or
+a Prometheus textfile (--metrics-out).
+"""
+
+import atexit
+import json
+import re
+import sys
+import threading
+import time
+
+# Histogram buckets (seconds) for the Prometheus export.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+GID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_path(endpoint: str) -> str:
+    return endpoint.split("?", 1)[0]
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Collapse GIDs so calls group by route: /tasks/123/stories -> /tasks/{gid}/stories."""
+    return GID_SEGMENT.sub("/{gid}", endpoint_path(endpoint))
+
+
+def human_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024 or unit == "MB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def labels(method: str, endpoint: str) -> str:
+    """Prometheus labels for a route."""
+    escaped = endpoint.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'method="{method}",endpoint="{escaped}"'
+
+
+class Tracer:
+    """Thread-safe collector of request records for one command run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, method: str, endpoint: str, status: int, started: float,
+               bytes_out: int = 0, bytes_in: int = 0, retries: int = 0, cached: bool = False):
+        """Add one finished call; started is its time.perf_counter() at send."""
+        now = time.perf_counter()
+        entry = {
+            "method": method,
+            "endpoint": endpoint_template(endpoint),
+            "path": endpoint_path(endpoint),
+            "status": status,
+            "start_ms": round((started - self.started) * 1000, 3),
+            "latency_ms": round((now - started) * 1000, 3),
+            "bytes_out": bytes_out,
+            "bytes_in": bytes_in,
+            "retries": retries,
+            "cached": cached,
+        }
+        with self._lock:
+            self.records.append(entry)
+
+    def summary(self) -> list:
+        """One row per (method, endpoint template), slowest total first."""
+        groups = {}
+        with self._lock:
+            records = list(self.records)
+        for r in records:
+            groups.setdefault((r["method"], r["endpoint"]), []).append(r)
+        rows = []
+        for (method, endpoint), items in groups.items():
+            latencies = [r["latency_ms"] for r in items]
+            rows.append({
+                "method": method,
+                "endpoint": endpoint,
+                "count": len(items),
+                "errors": sum(1 for r in items if r["status"] >= 400),
+                "retries": sum(r["retries"] for r in items),
+                "cached": sum(1 for r in items if r["cached"]),
+                "total_ms": round(sum(latencies), 3),
+                "p50_ms": percentile(latencies, 0.5),
+                "p95_ms": percentile(latencies, 0.95),
+                "max_ms": max(latencies),
+                "bytes_out": sum(r["bytes_out"] for r in items),
+                "bytes_in": sum(r["bytes_in"] for r in items),
+            })
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+
+    def totals(self) -> dict:
+        with self._lock:
+            records = list(self.records)
+        return {
+            "requests": len(records),
+            "wall_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "api_ms": round(sum(r["latency_ms"] for r in records), 3),
+            "bytes_out": sum(r["bytes_out"] for r in records),
+            "bytes_in": sum(r["bytes_in"] for r in records),
+            "retries": sum(r["retries"] for r in records),
+        }
+
+    def print_report(self, out=None):
+        """Print the per-request timeline and the summary table."""
+        out = out or sys.stderr
+        with self._lock:
+            records = sorted(self.records, key=lambda r: r["start_ms"])
+        totals = self.totals()
+        print("\nRequest timeline:", file=out)
+        for r in records:
+            status = "cache" if r["cached"] else r["status"]
+            retries = f"  retries={r['retries']}" if r["retries"] else ""
+            print(f"  +{r['start_ms'] / 1000:7.3f}s {r['latency_ms']:8.1f} ms  {r['method']:<6} {status:<5} "
+                  f"{r['path']}  out {human_bytes(r['bytes_out'])} in {human_bytes(r['bytes_in'])}{retries}",
+                  file=out)
+
+        api_ms = totals["api_ms"] or 1
+        print("\nSummary:", file=out)
+        print(f"  {'METHOD':<6} {'ENDPOINT':<38} {'N':>4} {'ERR':>3} {'RETRY':>5} {'P50 ms':>8} "
+              f"{'P95 ms':>8} {'TOTAL ms':>9} {'SHARE':>6} {'IN':>8} {'OUT':>8}", file=out)
+        for row in self.summary():
+            print(f"  {row['method']:<6} {row['endpoint']:<38} {row['count']:>4} {row['errors']:>3} "
+                  f"{row['retries']:>5} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['total_ms']:>9.1f} "
+                  f"{row['total_ms'] / api_ms:>6.0%} {human_bytes(row['bytes_in']):>8} "
+                  f"{human_bytes(row['bytes_out']):>8}", file=out)
+        print(f"  {totals['requests']} requests, {totals['api_ms']:.0f} ms in API calls, "
+              f"{totals['wall_ms']:.0f} ms wall, {totals['retries']} retries", file=out)
+
+    def write_metrics(self, path: str):
+        """Write JSON for *.json paths, otherwise a Prometheus textfile."""
+        with open(path, "w") as f:
+            if path.endswith(".json"):
+                with self._lock:
+                    records = list(self.records)
+                json.dump({"totals": self.totals(), "summary": self.summary(), "requests": records}, f, indent=2)
+                f.write("\n")
+            else:
+                f.write(self.prometheus())
+
+    def prometheus(self) -> str:
+        with self._lock:
+            records = list(self.records)
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        counts, durations, sizes, retries = {}, {}, {}, {}
+        for r in records:
+            route = (r["method"], r["endpoint"])
+            counts[route + (r["status"],)] = counts.get(route + (r["status"],), 0) + 1
+            durations.setdefault(route, []).append(r["latency_ms"] / 1000)
+            sizes[route + ("out",)] = sizes.get(route + ("out",), 0) + r["bytes_out"]
+            sizes[route + ("in",)] = sizes.get(route + ("in",), 0) + r["bytes_in"]
+            retries[route] = retries.get(route, 0) + r["retries"]
+
+        metric("asana_requests_total", "counter", "Asana API requests by route and status.")
+        for (method, endpoint, status), n in sorted(counts.items()):
+            lines.append(f'asana_requests_total{{{labels(method, endpoint)},status="{status}"}} {n}')
+
+        metric("asana_request_duration_seconds", "histogram", "Asana API request latency, retries included.")
+        for (method, endpoint), values in sorted(durations.items()):
+            route = labels(method, endpoint)
+            for bound in LATENCY_BUCKETS:
+                n = sum(1 for v in values if v <= bound)
+                lines.append(f'asana_request_duration_seconds_bucket{{{route},le="{bound}"}} {n}')
+            lines.append(f'asana_request_duration_seconds_bucket{{{route},le="+Inf"}} {len(values)}')
+            lines.append(f"asana_request_duration_seconds_sum{{{route}}} {sum(values):.6f}")
+            lines.append(f"asana_request_duration_seconds_count{{{route}}} {len(values)}")
+
+        metric("asana_request_bytes_total", "counter", "Request and response body bytes on the wire.")
+        for (method, endpoint, direction), n in sorted(sizes.items()):
+            lines.append(f'asana_request_bytes_total{{{labels(method, endpoint)},direction="{direction}"}} {n}')
+
+        metric("asana_request_retries_total", "counter", "Retries after 429 or 5xx responses.")
+        for (method, endpoint), n in sorted(retries.items()):
+            lines.append(f"asana_request_retries_total{{{labels(method, endpoint)}}} {n}")
+        return "\n".join(lines) + "\n"
+
+
+_tracer = None
+
+
+def start_tracing() -> Tracer:
+    """Start recording requests for this process (replacing any previous run)."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing():
+    global _tracer
+    _tracer = None
+
+
+def get_tracer():
+    """Return the active Tracer, or None when tracing is off."""
+    return _tracer
+
+
+def finish_tracing(trace: bool = False, metrics_out: str = None):
+    """Print the report and/or write metrics for the active run, then stop tracing."""
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    stop_tracing()
+    if trace:
+        tracer.print_report()
+    if metrics_out:
+        tracer.write_metrics(metrics_out)
+
+
+def add_trace_arguments(parser):
+    """Add --trace and --metrics-out to an argparse parser."""
+    parser.add_argument("--trace", action="store_true",
+                        help="Print a per-request timeline and summary table to stderr")
+    parser.add_argument("--metrics-out", metavar="PATH",
+                        help="Write request metrics as JSON (*.json) or a Prometheus textfile")
+
+
+def trace_until_exit(trace: bool = False, metrics_out: str = None):
+    """For one-shot scripts: trace every request and report when the process exits."""
+    if trace or metrics_out:
+        start_tracing()
+        atexit.register(finish_tracing, trace, metrics_out)
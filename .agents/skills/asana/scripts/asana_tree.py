@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Parallel walk of a task's subtask hierarchy.
+Each node's children are requested as soon as the node itself is known, so
+all requests for one level run side by side and wall time grows with the
+depth of the tree rather than the number of nodes.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asana_client import paginate, request_json
+
+
+def walk_subtasks(token: str, task_id: str, opt_fields: str, max_depth: int = None, concurrency: int = 8):
+    """Yield (depth, parent_gid, task) for every subtask under task_id, in tree order.
+
+    Direct subtasks have depth 1; max_depth stops the walk below that level.
+    Nodes are yielded as soon as they and everything before them in pre-order
+    have arrived. Leaves (num_subtasks == 0) are not fetched. Raises APIError.
+    """
+    if "num_subtasks" not in opt_fields.split(","):
+        opt_fields += ",num_subtasks"
+    pending = {}
+    lock = threading.Lock()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def fetch(gid, depth):
+        children = list(paginate(lambda endpoint: request_json(endpoint, token),
+                                 f"/tasks/{gid}/subtasks", {"opt_fields": opt_fields}))
+        if max_depth is None or depth < max_depth:
+            for child in children:
+                if child.get("num_subtasks", 1):
+                    with lock:
+                        pending[child["gid"]] = executor.submit(fetch, child["gid"], depth + 1)
+        return children
+
+    def visit(gid, depth):
+        with lock:
+            future = pending.pop(gid)
+        for child in future.result():
+            yield depth, gid, child
+            with lock:
+                expanded = child["gid"] in pending
+            if expanded:
+                yield from visit(child["gid"], depth + 1)
+
+    try:
+        pending[task_id] = executor.submit(fetch, task_id, 1)
+        yield from visit(task_id, 1)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -2,43 +2,29 @@
 """
 Batch create Asana tasks from JSON file with standardized format.
 Usage: python3 batch_create_tasks.py --input tasks.json --parent-id 1212613149794163
+       python3 batch_create_tasks.py --input tasks.ndjson --project-id 1212613149794163
+       python3 batch_create_tasks.py --input tasks.json --project-id 1212613149794163 --upsert
 """
 
 import argparse
 import json
-import os
 import sys
-from pathlib import Path
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, islice
 
-ASANA_API_BASE = "https://app.asana.com/api/1.0"
-
-
-def load_env():
-    """Load .env file from asana skill directory."""
-    env_paths = [
-        Path(__file__).parent.parent / ".env",
-        Path(__file__).parent / ".env",
-        Path.home() / ".claude" / "skills" / "asana" / ".env",
-        Path.home() / ".claude" / "skills" / ".env",
-    ]
-    
-    for env_path in env_paths:
-        if env_path.exists():
-            with open(env_path) as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith("#") and "=" in line:
-                        key, value = line.split("=", 1)
-                        if key.strip() not in os.environ:
-                            os.environ[key.strip()] = value.strip().strip('"').strip("'")
+from asana_batch import MAX_BATCH_ACTIONS, BatchQueue
+from asana_client import NETWORK_ERRORS, APIError, describe_error, paginate, request_json
+from asana_config import get_config
+from asana_deps import DependencyCycle, build_graph, link_dependencies, plan_waves
+from asana_fields import create_with_fields, forget_field, rejects_custom_fields, resolve_field
+from asana_journal import Journal, content_hash, default_journal_path
+from asana_trace import add_trace_arguments, trace_until_exit
 
 
 def get_token():
     """Get Asana Personal Access Token."""
-    load_env()
-    token = os.environ.get("ASANA_PAT") or os.environ.get("ASANA_TOKEN")
+    token = get_config().token
     if not token:
         print("ERROR: ASANA_PAT not set.")
         sys.exit(1)
@@ -46,22 +32,11 @@ def get_token():
 
 
 def api_request(endpoint, method="GET", data=None):
-    """Make Asana API request."""
-    url = f"{ASANA_API_BASE}{endpoint}"
-    headers = {
-        "Authorization": f"Bearer {get_token()}",
-        "Content-Type": "application/json",
-    }
-    
-    body = json.dumps({"data": data}).encode() if data else None
-    req = Request(url, data=body, headers=headers, method=method)
-    
+    """Make Asana API request over the shared keep-alive connection pool."""
     try:
-        with urlopen(req) as response:
-            return json.loads(response.read().decode())
-    except HTTPError as e:
-        error_body = e.read().decode()
-        print(f"API Error {e.code}: {error_body}")
+        return request_json(endpoint, get_token(), method, data)
+    except APIError as e:
+        print(f"API Error {e.status}: {e.body}")
         return None
 
 
@@ -114,22 +89,31 @@ def format_task_description(task: dict) -> str:
     return "\n".join(lines)
 
 
-def create_subtask(parent_task_id: str, name: str, notes: str) -> dict:
+def post_task(endpoint: str, data: dict, hours: float = None,
+              project_id: str = None, parent_id: str = None) -> dict:
+    """POST a task, setting Dev Hours inline when the project has the field.
+    
+    Raises APIError or a network error; callers report it against the task.
+    """
+    token = get_token()
+    field_gid = resolve_field(token, project_id, parent_id) if hours else None
+    if field_gid:
+        data = dict(data, custom_fields={field_gid: hours})
+    task, _ = create_with_fields(token, endpoint, data, project_id, parent_id)
+    return task
+
+
+def create_subtask(parent_task_id: str, name: str, notes: str, hours: float = None) -> dict:
     """Create a subtask under parent task."""
     data = {
         "name": name,
         "notes": notes,
     }
     
-    result = api_request(f"/tasks/{parent_task_id}/subtasks", method="POST", data=data)
-    if result:
-        task = result.get("data", {})
-        print(f"✓ Created: {task.get('name')} (GID: {task.get('gid')})")
-        return task
-    return None
+    return post_task(f"/tasks/{parent_task_id}/subtasks", data, hours, parent_id=parent_task_id)
 
 
-def create_task(project_id: str, name: str, notes: str) -> dict:
+def create_task(project_id: str, name: str, notes: str, hours: float = None) -> dict:
     """Create a new task in project."""
     data = {
         "name": name,
@@ -137,76 +121,504 @@ def create_task(project_id: str, name: str, notes: str) -> dict:
         "projects": [project_id],
     }
     
-    result = api_request("/tasks", method="POST", data=data)
-    if result:
-        task = result.get("data", {})
-        print(f"✓ Created: {task.get('name')} (GID: {task.get('gid')})")
-        return task
-    return None
+    return post_task("/tasks", data, hours, project_id=project_id)
+
+
+def create_one(args, task_name: str, task_notes: str, hours: float = None) -> dict:
+    """Create a single task or subtask depending on CLI target."""
+    if args.parent_id:
+        return create_subtask(args.parent_id, task_name, task_notes, hours)
+    return create_task(args.project_id, task_name, task_notes, hours)
+
+
+# Tasks buffered per worker while streaming; bounds memory for huge inputs.
+IN_FLIGHT_PER_WORKER = 4
+
+# Everything --upsert compares, fetched in the one listing of the target.
+UPSERT_FIELDS = "name,notes,custom_fields.gid,custom_fields.name,custom_fields.type,custom_fields.number_value"
+
+
+def read_ndjson_spec(f, project_name: str = None):
+    """Stream an NDJSON spec: one task object per line.
+    
+    An optional first line like {"project_name": "X"} sets the project name.
+    Returns (project_name, iterator of task dicts); lines are parsed lazily.
+    """
+    lines = (line for line in f if line.strip())
+    first = next(lines, None)
+    if first is None:
+        return project_name or "Project", iter(())
+    first = json.loads(first)
+    if "project_name" in first and "title" not in first:
+        project_name = project_name or first["project_name"]
+        tasks = (json.loads(line) for line in lines)
+    else:
+        tasks = chain([first], (json.loads(line) for line in lines))
+    return project_name or "Project", tasks
+
+
+def chunked(items, size: int):
+    """Yield lists of up to size items from an iterator."""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def resolve_dev_hours(args) -> str:
+    """Resolve the Dev Hours field GID for the batch target, warning if absent."""
+    project_id = None if args.parent_id else args.project_id
+    try:
+        field_gid = resolve_field(get_token(), project_id, args.parent_id)
+    except APIError as e:
+        print(f"API Error {e.status}: {e.body}")
+        return None
+    if not field_gid:
+        print("⚠ Dev Hours field not found; estimates stay in the description only")
+    return field_gid
+
+
+def create_batched(args, pending: list, field_gid: str = None, journal: Journal = None):
+    """Create pending tasks through the /batch endpoint, 10 per HTTP request.
+    
+    Yields each created task, or {"name", "error"} on failure, in input order.
+    """
+    project_id = None if args.parent_id else args.project_id
+    
+    def enqueue(queue, index, with_fields=True):
+        name, notes, hours = pending[index][:3]
+        data = {"name": name, "notes": notes}
+        if with_fields and hours and field_gid:
+            data["custom_fields"] = {field_gid: hours}
+        if args.parent_id:
+            queue.create_subtask(args.parent_id, data, key=index)
+        else:
+            queue.create_task(args.project_id, data, key=index)
+    
+    queue = BatchQueue(get_token())
+    for index in range(len(pending)):
+        enqueue(queue, index)
+    results = list(queue.flush(args.concurrency))
+    
+    # Retry tasks whose inline Dev Hours were rejected, without the field;
+    # other 400s are reported as ordinary failures below.
+    rejected = [r.key for r in results
+                if field_gid and pending[r.key][2] and rejects_custom_fields(r.status, r.error)]
+    if rejected:
+        forget_field(project_id, args.parent_id)
+        for index in rejected:
+            enqueue(queue, index, with_fields=False)
+        for result in queue.flush(args.concurrency):
+            results[result.key] = result
+    
+    for result in results:
+        if result.ok:
+            if journal:
+                journal.record(pending[result.key][4], result.data.get("gid"), result.data.get("name"))
+            yield result.data
+        elif result.status:
+            yield {"name": pending[result.key][0], "error": f"API Error {result.status}: {result.error}"}
+        else:
+            yield {"name": pending[result.key][0], "error": result.error}
+
+
+def task_target(args) -> str:
+    """Journal target for this run: the parent task or the project."""
+    return f"parent:{args.parent_id}" if args.parent_id else f"project:{args.project_id}"
+
+
+def with_keys(target: str, items):
+    """Attach a journal key to each item: content hash plus occurrence index."""
+    seen = Counter()
+    for name, notes, hours, estimate in items:
+        digest = content_hash(target, name, notes, hours)
+        seen[digest] += 1
+        yield name, notes, hours, estimate, f"{digest}#{seen[digest]}"
+
+
+def list_target(args, opt_fields: str) -> list:
+    """List the parent's subtasks or the project's tasks, exiting if that fails.
+    
+    Creating without a reliable listing would duplicate tasks or fail one by one.
+    """
+    if args.parent_id:
+        endpoint = f"/tasks/{args.parent_id}/subtasks"
+    else:
+        endpoint = f"/projects/{args.project_id}/tasks"
+    token = get_token()
+    try:
+        return list(paginate(lambda e: request_json(e, token), endpoint, {"opt_fields": opt_fields}))
+    except (APIError, *NETWORK_ERRORS) as e:
+        print(f"ERROR: Cannot list {task_target(args)}: {describe_error(e)}")
+        sys.exit(1)
+
+
+def fetch_existing(args, journal: Journal) -> dict:
+    """Reconcile the journal against the tasks that already exist under the target.
+    
+    Journal entries whose task no longer exists are dropped. Returns a map of
+    task name -> GIDs that exist remotely but are not yet in the journal.
+    Exits if the listing fails, before anything is created.
+    """
+    existing = {}
+    gids = set()
+    for task in list_target(args, "name"):
+        gids.add(task["gid"])
+        existing.setdefault(task["name"], deque()).append(task["gid"])
+    
+    stale = [key for key, entry in journal.done.items() if entry["gid"] not in gids]
+    for key in stale:
+        journal.forget(key)
+    journaled = {entry["gid"] for entry in journal.done.values()}
+    for name in existing:
+        existing[name] = deque(gid for gid in existing[name] if gid not in journaled)
+    
+    untracked = sum(len(g) for g in existing.values())
+    print(f"Reconciled journal: {len(gids)} existing tasks, {untracked} not yet journaled, "
+          f"{len(stale)} stale entries dropped")
+    return existing
+
+
+def create_and_record(args, item, journal: Journal = None) -> dict:
+    """Create one task and append it to the journal as soon as it exists.
+    
+    Failures come back as {"name", "error"} so the consuming loop can report
+    them in input order.
+    """
+    name, notes, hours, _, key = item
+    try:
+        task = create_one(args, name, notes, hours)
+    except (APIError, *NETWORK_ERRORS) as e:
+        return {"name": name, "error": describe_error(e)}
+    if task and journal:
+        journal.record(key, task.get("gid"), task.get("name"))
+    return task
+
+
+def create_stream(args, items, journal: Journal = None, existing: dict = None):
+    """Create tasks as items are read, yielding results in input order.
+    
+    Only a bounded window of tasks is buffered or in flight at any time, so
+    memory stays flat and creation starts before the input is fully read.
+    Items already in the journal (or matched by name to an existing task when
+    reconciling) are not created again; they come back marked "skipped".
+    Failed items come back as {"name", "error"}.
+    """
+    field = {"resolved": False, "gid": None}
+    
+    def already_created(item):
+        name, key = item[0], item[4]
+        entry = journal.lookup(key) if journal else None
+        if not entry and existing and existing.get(name):
+            gid = existing[name].popleft()
+            journal.record(key, gid, name)
+            entry = journal.lookup(key)
+        if entry:
+            return {"gid": entry["gid"], "name": entry.get("name") or name, "skipped": True}
+        return None
+    
+    def resolve_once(items):
+        # Resolve the Dev Hours field once, before the first task that needs it;
+        # workers then hit the cache. Items yielded as (item, skipped) pairs.
+        for item in items:
+            skipped = already_created(item)
+            if item[2] and not skipped and not field["resolved"]:
+                field["resolved"] = True
+                field["gid"] = resolve_dev_hours(args)
+            yield item, skipped
+    
+    items = resolve_once(items)
+    if args.batch_api:
+        for chunk in chunked(items, MAX_BATCH_ACTIONS * args.concurrency):
+            to_create = [item for item, skipped in chunk if not skipped]
+            created = create_batched(args, to_create, field["gid"], journal)
+            for _, skipped in chunk:
+                yield skipped or next(created)
+        return
+    
+    window = args.concurrency * IN_FLIGHT_PER_WORKER
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        in_flight = deque()
+        for item, skipped in items:
+            if skipped:
+                future = Future()
+                future.set_result(skipped)
+            else:
+                future = executor.submit(create_and_record, args, item, journal)
+            in_flight.append(future)
+            if len(in_flight) >= window:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def normalize_name(name: str) -> str:
+    return " ".join((name or "").split())
+
+
+def normalize_notes(notes: str) -> str:
+    """Notes as Asana stores them: no trailing whitespace on lines or at the ends."""
+    return "\n".join(line.rstrip() for line in (notes or "").strip().splitlines())
+
+
+def changed_fields(current: dict, notes: str, hours: float = None) -> dict:
+    """PUT body with only what differs from an existing task matched by title."""
+    data = {}
+    if normalize_notes(current.get("notes")) != normalize_notes(notes):
+        data["notes"] = notes
+    field = next((f for f in current.get("custom_fields") or []
+                  if f.get("name") == "Dev Hours" and f.get("type") == "number"), None)
+    if hours is not None and field and field.get("number_value") != hours:
+        data["custom_fields"] = {field["gid"]: hours}
+    return data
+
+
+def upsert_one(args, item, current: dict = None) -> dict:
+    """Create the task, or PUT only what changed on the matched one.
+    
+    Returns the task marked with its "upsert" outcome, or {"name", "error"}.
+    """
+    name, notes, hours = item[:3]
+    try:
+        if not current:
+            return dict(create_one(args, name, notes, hours), upsert="created")
+        data = changed_fields(current, notes, hours)
+        if data:
+            request_json(f"/tasks/{current['gid']}?opt_fields=gid", get_token(), "PUT", data)
+    except (APIError, *NETWORK_ERRORS) as e:
+        return {"name": name, "error": describe_error(e)}
+    outcome = "patched" if data else "unchanged"
+    return {"gid": current["gid"], "name": current.get("name"), "upsert": outcome, "fields": sorted(data)}
+
+
+def upsert_stream(args, items):
+    """Upsert tasks against one listing of the target, yielding results in input order.
+    
+    Titles are matched in memory (whitespace-insensitive, first unmatched task
+    first), so an unchanged task costs no request at all.
+    """
+    existing = {}
+    for task in list_target(args, UPSERT_FIELDS):
+        existing.setdefault(normalize_name(task.get("name")), deque()).append(task)
+    print(f"Listed {sum(map(len, existing.values()))} existing tasks under {task_target(args)}")
+    
+    window = args.concurrency * IN_FLIGHT_PER_WORKER
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        in_flight = deque()
+        for item in items:
+            matches = existing.get(normalize_name(item[0]))
+            current = matches.popleft() if matches else None
+            in_flight.append(executor.submit(upsert_one, args, item, current))
+            if len(in_flight) >= window:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def link_wave(args, wave: list, deps: list, gids: list) -> int:
+    """Add the dependencies of one created wave in batched calls. Returns links made."""
+    links = {}
+    for index in wave:
+        if not gids[index] or not deps[index]:
+            continue
+        missing = [d for d in deps[index] if not gids[d]]
+        if missing:
+            print(f"⚠ {len(missing)} dependencies of GID {gids[index]} were not created; not linked")
+        linked = [gids[d] for d in deps[index] if gids[d]]
+        if linked:
+            links[gids[index]] = linked
+    
+    failed = set()
+    for result in link_dependencies(get_token(), links, args.concurrency):
+        if not result.ok:
+            failed.add(result.key)
+            print(f"✗ Failed to link dependencies of GID {result.key}: {result.error}")
+    return sum(len(linked) for gid, linked in links.items() if gid not in failed)
 
 
 def main():
     parser = argparse.ArgumentParser(description="Batch create Asana tasks from JSON")
-    parser.add_argument("--input", required=True, help="JSON file with tasks")
+    parser.add_argument("--input", required=True,
+                        help="JSON file with tasks, or NDJSON (.ndjson/.jsonl, or - for stdin)")
     parser.add_argument("--parent-id", help="Parent task ID for subtasks")
     parser.add_argument("--project-id", help="Project ID for top-level tasks")
     parser.add_argument("--dry-run", action="store_true", help="Preview without creating")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of tasks to create in parallel (default: 1)")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="Send creations through /batch, up to 10 per HTTP request")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Treat --input as NDJSON (one task per line) and stream it")
+    parser.add_argument("--project-name", help="Project name for titles (overrides the spec)")
+    parser.add_argument("--journal", metavar="PATH",
+                        help="Checkpoint journal (default: one per input and target in the cache dir)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip entries the journal says were already created")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Match the journal against existing subtasks/tasks, then resume")
+    parser.add_argument("--upsert", action="store_true",
+                        help="List the target once and match titles: PUT only changed fields, "
+                             "create the rest (no journal, dependencies stay text)")
+    parser.add_argument("--no-dependencies", action="store_true",
+                        help="Keep dependencies as description text only; don't link them in Asana")
+    add_trace_arguments(parser)
     
     args = parser.parse_args()
+    trace_until_exit(args.trace, args.metrics_out)
     
     if not args.parent_id and not args.project_id:
         print("ERROR: Either --parent-id or --project-id is required")
         sys.exit(1)
+    if args.concurrency < 1:
+        print("ERROR: --concurrency must be at least 1")
+        sys.exit(1)
+    if args.upsert and (args.resume or args.reconcile or args.batch_api):
+        print("ERROR: --upsert cannot be combined with --resume, --reconcile or --batch-api")
+        sys.exit(1)
     
-    # Load JSON file
-    with open(args.input, "r") as f:
-        data = json.load(f)
-    
-    project_name = data.get("project_name", "Project")
-    subtasks = data.get("subtasks", [])
-    
-    print(f"Project: {project_name}")
-    print(f"Found {len(subtasks)} tasks to create")
+    streaming = args.ndjson or args.input == "-" or args.input.endswith((".ndjson", ".jsonl"))
+    if streaming:
+        f = sys.stdin if args.input == "-" else open(args.input, "r")
+        project_name, subtasks = read_ndjson_spec(f, args.project_name)
+        print(f"Project: {project_name}")
+        print(f"Streaming tasks from {args.input}")
+    else:
+        # Load JSON file
+        with open(args.input, "r") as f:
+            data = json.load(f)
+        project_name = args.project_name or data.get("project_name", "Project")
+        subtasks = data.get("subtasks", [])
+        print(f"Project: {project_name}")
+        print(f"Found {len(subtasks)} tasks to create")
     print("-" * 50)
     
-    created_count = 0
-    total_hours = 0
+    totals = {"tasks": 0, "hours": 0}
     
-    for task in subtasks:
-        platform = task.get("platform", "API")
-        title = task.get("title", "Untitled")
-        estimate = task.get("estimate", "")
-        
-        # Parse hours from estimate
-        if estimate:
-            try:
-                hours = float(estimate.replace("h", "").strip())
-                total_hours += hours
-            except ValueError:
-                pass
-        
-        task_name = format_task_title(project_name, platform, title)
-        task_notes = format_task_description(task)
-        
-        if args.dry_run:
-            print(f"\n[DRY RUN] {task_name}")
-            print(f"  Estimate: {estimate}")
-        else:
-            if args.parent_id:
-                result = create_subtask(args.parent_id, task_name, task_notes)
-            else:
-                result = create_task(args.project_id, task_name, task_notes)
+    def prepare(subtasks):
+        for task in subtasks:
+            platform = task.get("platform", "API")
+            title = task.get("title", "Untitled")
+            estimate = task.get("estimate", "")
+            hours = None
+            
+            # Parse hours from estimate
+            if estimate:
+                try:
+                    hours = float(estimate.replace("h", "").strip())
+                    totals["hours"] += hours
+                except ValueError:
+                    pass
             
-            if result:
-                created_count += 1
+            totals["tasks"] += 1
+            yield format_task_title(project_name, platform, title), format_task_description(task), hours, estimate
+    
+    # Dependencies name other entries by title; they need the whole spec, so
+    # streamed input keeps them as description text only. So does --upsert,
+    # which would otherwise re-link every dependency on each run.
+    deps, waves = None, None
+    if not streaming and not args.no_dependencies and not args.upsert:
+        deps, unknown = build_graph(subtasks)
+        for index, title in unknown:
+            print(f"⚠ {subtasks[index].get('title', 'Untitled')}: dependency '{title}' "
+                  f"is not in this spec; kept as text only")
+        if any(deps):
+            try:
+                waves = plan_waves(deps)
+            except DependencyCycle as e:
+                titles = [subtasks[index].get("title", "Untitled") for index in e.cycle]
+                print(f"ERROR: Dependency cycle: {' -> '.join(titles)}")
+                sys.exit(1)
+            print(f"Dependencies: {sum(map(len, deps))} links across {len(waves)} waves")
+            print("-" * 50)
+    
+    journal = None
+    existing = None
+    if not args.dry_run and not args.upsert:
+        journal_path = args.journal or default_journal_path(args.input, task_target(args))
+        journal = Journal(journal_path, task_target(args))
+        if args.reconcile:
+            existing = fetch_existing(args, journal)
+        elif not args.resume and journal.done:
+            # Without --resume every entry is created again, so start afresh.
+            print(f"⚠ Journal {journal_path} already lists {len(journal.done)} tasks for this target; "
+                  f"creating them again (pass --resume to skip them)")
+            for key in list(journal.done):
+                journal.forget(key)
+    
+    counts = {"created": 0, "skipped": 0, "linked": 0, "failed": 0, "unchanged": 0, "patched": 0}
+    
+    def report(result):
+        if result and result.get("error"):
+            counts["failed"] += 1
+            print(f"✗ {result['name']}: {result['error']}")
+        elif result and result.get("upsert") == "unchanged":
+            counts["unchanged"] += 1
+            print(f"= Unchanged: {result.get('name')} (GID: {result.get('gid')})")
+        elif result and result.get("upsert") == "patched":
+            counts["patched"] += 1
+            print(f"✓ Patched {', '.join(result['fields'])}: {result.get('name')} (GID: {result.get('gid')})")
+        elif result and result.get("skipped"):
+            counts["skipped"] += 1
+            print(f"↷ Skipped (already created): {result.get('name')} (GID: {result.get('gid')})")
+        elif result:
+            counts["created"] += 1
+            print(f"✓ Created: {result.get('name')} (GID: {result.get('gid')})")
+    
+    if args.dry_run:
+        prepared = list(prepare(subtasks))
+        for number, wave in enumerate(waves or [range(len(prepared))], 1):
+            if waves:
+                print(f"\nWave {number}/{len(waves)}:")
+            for index in wave:
+                task_name, _, _, estimate = prepared[index]
+                print(f"\n[DRY RUN] {task_name}")
+                print(f"  Estimate: {estimate}")
+                if deps and deps[index]:
+                    print(f"  Depends on: {', '.join(prepared[d][0] for d in deps[index])}")
+    elif args.upsert:
+        for result in upsert_stream(args, prepare(subtasks)):
+            report(result)
+    elif waves:
+        # Each wave only depends on earlier ones: create it in parallel, then
+        # link it, so an interrupted run never leaves a task without its prerequisites.
+        items = list(with_keys(task_target(args), prepare(subtasks)))
+        gids = [None] * len(items)
+        for number, wave in enumerate(waves, 1):
+            print(f"Wave {number}/{len(waves)}: {len(wave)} tasks")
+            for index, result in zip(wave, create_stream(args, (items[i] for i in wave), journal, existing)):
+                gids[index] = result.get("gid") if result else None  # None for failures
+                report(result)
+            counts["linked"] += link_wave(args, wave, deps, gids)
+        journal.close()
+    else:
+        # Results arrive in submission order, so output stays deterministic
+        # regardless of which request finishes first.
+        items = with_keys(task_target(args), prepare(subtasks))
+        for result in create_stream(args, items, journal, existing):
+            report(result)
+        journal.close()
     
     print("-" * 50)
-    print(f"Total estimated hours: {total_hours}h")
+    print(f"Total estimated hours: {totals['hours']}h")
     
     if args.dry_run:
-        print(f"Dry run complete. {len(subtasks)} tasks would be created.")
+        print(f"Dry run complete. {totals['tasks']} tasks would be created.")
+    elif args.upsert:
+        print(f"Upsert: {counts['unchanged']} unchanged, {counts['patched']} patched, "
+              f"{counts['created']} created.")
+        if counts["failed"]:
+            print(f"{counts['failed']} tasks failed (see ✗ lines above).")
+            sys.exit(1)
     else:
-        print(f"Created {created_count}/{len(subtasks)} tasks.")
+        skipped = f" ({counts['skipped']} already created, skipped)" if counts["skipped"] else ""
+        print(f"Created {counts['created']}/{totals['tasks'] - counts['skipped']} tasks.{skipped}")
+        if waves:
+            print(f"Linked {counts['linked']}/{sum(map(len, deps))} dependencies.")
+        if counts["failed"]:
+            print(f"{counts['failed']} tasks failed (see ✗ lines above).")
+            sys.exit(1)
 
 
 if __name__ == "__main__":
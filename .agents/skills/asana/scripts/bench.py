@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Asana scripts.
+Usage: python3 bench.py suite [--sizes 10,100] [--latency 50] [--json results.json]
+       python3 bench.py env [--requests 500]
+       python3 bench.py ratelimit [--requests 200] [--threads 15] [--throttle 0.2]
+       python3 bench.py persistent [--runs 30] [--latency 20]
+       python3 bench.py transfer [--tasks 1000] [--notes-kb 20]
+"""
+
+import argparse
+import builtins
+import io
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.request import Request, urlopen
+
+import asana_config
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+MOCK_PROJECT = "100"
+
+
+@contextmanager
+def count_fs_calls():
+    """Count stat() and open() calls made inside the block."""
+    counts = {"stat": 0, "open": 0}
+    real_stat, real_open, real_io_open = os.stat, builtins.open, io.open
+
+    def stat(*args, **kwargs):
+        counts["stat"] += 1
+        return real_stat(*args, **kwargs)
+
+    def open_(*args, **kwargs):
+        counts["open"] += 1
+        return real_open(*args, **kwargs)
+
+    os.stat, builtins.open, io.open = stat, open_, open_
+    try:
+        yield counts
+    finally:
+        os.stat, builtins.open, io.open = real_stat, real_open, real_io_open
+
+
+def bench_env(args):
+    """Config resolution cost for a batch: re-read per request vs cached once."""
+    requests = args.requests
+    present = [p for p in asana_config.ENV_PATHS if p.is_file()]
+    print(f"Simulating {requests} API requests; "
+          f"{len(present)}/{len(asana_config.ENV_PATHS)} .env paths exist")
+
+    def run(label, resolve):
+        with count_fs_calls() as counts:
+            started = time.perf_counter()
+            for _ in range(requests):
+                resolve().token
+            elapsed = time.perf_counter() - started
+        # Each open() is followed by at least a read() and close() at the OS level.
+        syscalls = counts["stat"] + counts["open"] * 3
+        print(f"  {label:<10} stat={counts['stat']:<6} open={counts['open']:<6} "
+              f"~syscalls={syscalls:<7} {elapsed * 1000:8.2f} ms")
+        return syscalls
+
+    legacy = run("per-call", asana_config.reload_config)
+    asana_config._config = None  # count the one load the cached path still pays
+    cached = run("cached", asana_config.get_config)
+    print(f"Saved ~{legacy - cached} filesystem syscalls per {requests}-request batch")
+
+
+def bench_ratelimit(args):
+    """Create tasks against a mock server that injects 429s."""
+    import mock_server
+
+    state = mock_server.MockAsana(args.throttle, args.quota, args.retry_after)
+    server, base_url = mock_server.start_server(state=state)
+    os.environ["ASANA_API_BASE"] = base_url
+    asana_config.reload_config()
+    import asana_client
+
+    def create(i):
+        try:
+            asana_client.request_json("/tasks", "test", "POST", {"name": f"Task {i}"})
+            return True
+        except asana_client.APIError:
+            return False
+
+    print(f"Creating {args.requests} tasks with {args.threads} threads; mock throttle="
+          f"{args.throttle:g} quota={args.quota or '-'}/s retry-after={args.retry_after:g}s")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        created = sum(executor.map(create, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    scheduler = asana_client.get_scheduler()
+    print(f"  created={created}/{args.requests}  429s={state.stats['throttled']}  "
+          f"retries={scheduler.stats['retries']}  final concurrency={scheduler.limiter.limit}"
+          f"/{scheduler.limiter.max_limit}  {elapsed:.2f}s")
+    server.shutdown()
+
+
+def control(base_url: str, path: str) -> dict:
+    """Call a mock server control endpoint (/_stats or /_reset)."""
+    req = Request(f"{base_url}{path}", method="POST" if path == "/_reset" else "GET")
+    with urlopen(req) as response:
+        return json.loads(response.read().decode() or "{}")
+
+
+def run_script(base_url: str, workdir: str, argv: list) -> int:
+    """Run one of the scripts against base_url; returns rows of output."""
+    env = dict(os.environ, ASANA_API_BASE=base_url, ASANA_PAT="bench",
+               ASANA_CACHE="0", ASANA_CACHE_DIR=workdir)
+    result = subprocess.run([sys.executable, str(SCRIPTS_DIR / argv[0]), *argv[1:]],
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"    ! {' '.join(argv)} exited {result.returncode}: {result.stdout[-200:]}")
+    return len(result.stdout.splitlines())
+
+
+def write_spec(workdir: str, size: int) -> str:
+    path = os.path.join(workdir, f"spec_{size}.json")
+    subtasks = [{"platform": "BE", "title": f"Bench task {i}", "details": ["Detail"],
+                 "tests": ["Test"], "estimate": "2h"} for i in range(size)]
+    with open(path, "w") as f:
+        json.dump({"project_name": "Bench", "subtasks": subtasks}, f)
+    return path
+
+
+def suite_scenarios(workdir: str, size: int):
+    """Yield (name, tasks, [argv, ...]) for one input size."""
+    spec = write_spec(workdir, size)
+    batch = ["batch_create_tasks.py", "--input", spec, "--project-id", MOCK_PROJECT]
+    yield "batch sequential", size, [batch]
+    yield "batch --concurrency 8", size, [batch + ["--concurrency", "8"]]
+    yield "batch --batch-api", size, [batch + ["--batch-api", "--concurrency", "4"]]
+    runs = min(size, 10)
+    create = ["create_task.py", "--project-id", MOCK_PROJECT, "--project-name", "Bench",
+              "--platform", "BE", "--title", "Single", "--details", "a|b", "--estimate", "3h"]
+    yield f"create_task.py x{runs}", runs, [create] * runs
+    yield "asana_api.py list-tasks", None, [["asana_api.py", "list-tasks", MOCK_PROJECT]]
+    yield "asana_api.py search", None, [["asana_api.py", "search", "1", "Bench", "--max", str(size)]]
+    yield "asana_api.py me x5", 5, [["asana_api.py", "me"]] * 5
+
+
+def bench_suite(args):
+    """Throughput/latency of the scripts against a local mock at several sizes."""
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        import mock_server
+
+        state = mock_server.MockAsana(args.throttle, retry_after=args.retry_after,
+                                      latency=args.latency / 1000, error_rate=args.error_rate)
+        server, base_url = mock_server.start_server(state=state)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    print(f"Mock: {base_url} latency={args.latency:g}ms error-rate={args.error_rate:g} "
+          f"throttle={args.throttle:g}")
+    header = (f"{'scenario':<26}{'size':>6}{'wall s':>9}{'reqs':>7}{'req/s':>9}"
+              f"{'req/task':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print(header)
+    print("-" * len(header))
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for name, tasks, commands in suite_scenarios(workdir, size):
+                control(base_url, "/_reset")
+                started = time.perf_counter()
+                rows = 0
+                for argv in commands:
+                    rows = run_script(base_url, workdir, argv)
+                wall = time.perf_counter() - started
+                stats = control(base_url, "/_stats")
+                tasks = tasks or max(1, rows - 1)
+                row = {
+                    "scenario": name,
+                    "size": size,
+                    "tasks": tasks,
+                    "wall_s": round(wall, 4),
+                    "requests": stats["requests"],
+                    "requests_per_s": round(stats["requests"] / wall, 2) if wall else 0,
+                    "requests_per_task": round(stats["requests"] / tasks, 3),
+                    "p50_ms": round(stats["p50_ms"], 2),
+                    "p95_ms": round(stats["p95_ms"], 2),
+                    "p99_ms": round(stats["p99_ms"], 2),
+                    "throttled": stats["throttled"],
+                    "errors": stats["errors"],
+                }
+                results.append(row)
+                print(f"{name:<26}{size:>6}{wall:>9.2f}{row['requests']:>7}"
+                      f"{row['requests_per_s']:>9.1f}{row['requests_per_task']:>10.2f}"
+                      f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+
+    if server:
+        server.shutdown()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "config": {"latency_ms": args.latency, "error_rate": args.error_rate,
+                           "throttle": args.throttle, "sizes": sizes},
+                "results": results,
+            }, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+def bench_persistent(args):
+    """Per-command latency: a fresh process per call vs. `asana_api.py serve`."""
+    import mock_server
+
+    state = mock_server.MockAsana(latency=args.latency / 1000)
+    server, base_url = mock_server.start_server(state=state)
+    task = state.new_task({"name": "Bench task", "projects": [MOCK_PROJECT]})["gid"]
+    commands = [["get-task", task], ["add-comment", task, "bench"], ["me"]]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        sock_path = os.path.join(workdir, "asana.sock")
+        env = dict(os.environ, ASANA_API_BASE=base_url, ASANA_PAT="bench", ASANA_CACHE="0",
+                   ASANA_CACHE_DIR=workdir, ASANA_SOCKET=sock_path)
+
+        def timed(argv_for):
+            samples = []
+            for i in range(args.runs):
+                argv = argv_for(commands[i % len(commands)])
+                started = time.perf_counter()
+                subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, check=True)
+                samples.append(time.perf_counter() - started)
+            return samples
+
+        rows = [("cold: python3 asana_api.py <cmd>",
+                 timed(lambda cmd: [sys.executable, str(SCRIPTS_DIR / "asana_api.py"), *cmd]))]
+
+        daemon = subprocess.Popen([sys.executable, str(SCRIPTS_DIR / "asana_api.py"), "serve"],
+                                  env=env, stdout=subprocess.PIPE, text=True)
+        daemon.stdout.readline()  # "Serving on ..."
+        rows.append(("warm: python3 asana_cmd.py <cmd>",
+                     timed(lambda cmd: [sys.executable, str(SCRIPTS_DIR / "asana_cmd.py"), *cmd])))
+
+        # A long-lived caller talking to the socket directly pays no interpreter startup.
+        samples = []
+        for i in range(args.runs):
+            started = time.perf_counter()
+            with socket.socket(socket.AF_UNIX) as sock:
+                sock.connect(sock_path)
+                sock.sendall(json.dumps({"argv": commands[i % len(commands)]}).encode() + b"\n")
+                with sock.makefile("rb") as frames:
+                    for line in frames:
+                        if "exit" in json.loads(line):
+                            break
+            samples.append(time.perf_counter() - started)
+        rows.append(("warm: socket request", samples))
+        daemon.terminate()
+        daemon.wait()
+
+    server.shutdown()
+    print(f"Mock latency {args.latency:g}ms, {args.runs} runs of {', '.join(c[0] for c in commands)}")
+    print(f"{'mode':<36}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+    for label, samples in rows:
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        print(f"{label:<36}{ordered[len(ordered) // 2] * 1000:>9.1f}{p95 * 1000:>9.1f}"
+              f"{statistics.mean(samples) * 1000:>9.1f}")
+
+
+# Peak RSS comes from VmHWM: ru_maxrss can carry over the forking parent's peak across exec.
+TRANSFER_DRIVER = """
+import resource, sys
+from asana_client import paginate, paginate_stream, request_json
+endpoint, params = sys.argv[2], {"opt_fields": "name,notes"}
+if sys.argv[1] == "buffered":
+    records = paginate(lambda e: request_json(e, "bench"), endpoint, params)
+elif sys.argv[1] == "streamed":
+    records = paginate_stream("bench", endpoint, params)
+else:
+    records = []
+count = sum(1 for _ in records)
+try:
+    with open("/proc/self/status") as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(count, peak_kb)
+"""
+
+
+def bench_transfer(args):
+    """Bytes on the wire and peak RSS for a large list, buffered vs. streamed, with and without gzip."""
+    import mock_server
+
+    state = mock_server.MockAsana()
+    server, base_url = mock_server.start_server(state=state)
+    # Random prose compresses roughly like real task notes; repeated text would flatter gzip.
+    rng = random.Random(0)
+    words = ["deploy", "review", "api", "fix", "the", "user", "login", "cache", "page", "test",
+             "error", "when", "token", "sync", "and", "build", "report", "data", "for", "query"]
+    notes = [" ".join(rng.choice(words) + str(rng.randint(0, 99)) for _ in range(args.notes_kb * 130))
+             [:args.notes_kb * 1024] for _ in range(16)]
+    for i in range(args.tasks):
+        state.new_task({"name": f"Task {i}", "notes": notes[i % len(notes)], "projects": [MOCK_PROJECT]})
+    endpoint = f"/projects/{MOCK_PROJECT}/tasks"
+
+    print(f"{args.tasks} tasks with {args.notes_kb}KB notes, 100 per page")
+    print(f"{'mode':<24}{'wire KB':>10}{'peak RSS MB':>13}{'wall s':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, mode, gzip in [("imports only", "none", "1"),
+                                  ("buffered, identity", "buffered", "0"),
+                                  ("buffered, gzip", "buffered", "1"),
+                                  ("streamed, identity", "streamed", "0"),
+                                  ("streamed, gzip", "streamed", "1")]:
+            env = dict(os.environ, ASANA_API_BASE=base_url, ASANA_PAT="bench", ASANA_CACHE="0",
+                       ASANA_CACHE_DIR=workdir, ASANA_GZIP=gzip)
+            control(base_url, "/_reset")
+            started = time.perf_counter()
+            result = subprocess.run([sys.executable, "-c", TRANSFER_DRIVER, mode, endpoint], env=env,
+                                    cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True)
+            wall = time.perf_counter() - started
+            count, max_rss_kb = map(int, result.stdout.split())
+            stats = control(base_url, "/_stats")
+            print(f"{label:<24}{stats['bytes_out'] / 1024:>10.0f}{max_rss_kb / 1024:>13.1f}{wall:>9.2f}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the Asana scripts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    suite_parser = subparsers.add_parser("suite", help="Drive every script against a mock server")
+    suite_parser.add_argument("--sizes", default="10,100", help="Comma-separated task counts")
+    suite_parser.add_argument("--latency", type=float, default=20.0, help="Mock latency in ms")
+    suite_parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500s")
+    suite_parser.add_argument("--throttle", type=float, default=0.0, help="Fraction of 429s")
+    suite_parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After seconds")
+    suite_parser.add_argument("--base-url",
+                              help="Use an already running mock_server.py instead of starting one")
+    suite_parser.add_argument("--json", metavar="PATH", help="Write results as JSON")
+    suite_parser.set_defaults(func=bench_suite)
+
+    env_parser = subparsers.add_parser("env", help="Config/.env resolution cost")
+    env_parser.add_argument("--requests", type=int, default=500, help="Requests per batch")
+    env_parser.set_defaults(func=bench_env)
+
+    rate_parser = subparsers.add_parser("ratelimit", help="Retry/backoff against injected 429s")
+    rate_parser.add_argument("--requests", type=int, default=200, help="Tasks to create")
+    rate_parser.add_argument("--threads", type=int, default=15, help="Client threads")
+    rate_parser.add_argument("--throttle", type=float, default=0.2, help="Fraction of 429s")
+    rate_parser.add_argument("--quota", type=int, help="Mock server requests/second")
+    rate_parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After seconds")
+    rate_parser.set_defaults(func=bench_ratelimit)
+
+    persistent_parser = subparsers.add_parser("persistent", help="Cold vs. warm per-command latency")
+    persistent_parser.add_argument("--runs", type=int, default=30, help="Commands per mode")
+    persistent_parser.add_argument("--latency", type=float, default=20.0, help="Mock latency in ms")
+    persistent_parser.set_defaults(func=bench_persistent)
+
+    transfer_parser = subparsers.add_parser("transfer", help="Wire bytes and peak RSS of large lists")
+    transfer_parser.add_argument("--tasks", type=int, default=1000, help="Tasks in the listed project")
+    transfer_parser.add_argument("--notes-kb", type=int, default=20, help="Notes size per task in KB")
+    transfer_parser.set_defaults(func=bench_transfer)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,46 +2,30 @@
 """
 Create Asana tasks with standardized format for any project.
 Uses html_notes for rich text formatting and sets Dev Hours custom field.
+With --upsert, existing tasks are compared first and only changed fields are written.
 """
 
 import argparse
+import hashlib
 import json
-import os
+import re
 import sys
-from pathlib import Path
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
 
-ASANA_API_BASE = "https://app.asana.com/api/1.0"
+from asana_client import APIError, paginate_stream, request_json
+from asana_config import get_config
+from asana_fields import create_with_fields, forget_field, rejects_custom_fields, resolve_field, resolve_task_field
+from asana_trace import add_trace_arguments, trace_until_exit
 
 # Platform mapping
 PLATFORMS = ["BE", "FE", "DevOps", "QA", "Mobile", "Design", "Docs"]
 
-
-def load_env():
-    """Load .env file from asana skill directory."""
-    env_paths = [
-        Path(__file__).parent.parent / ".env",
-        Path(__file__).parent / ".env",
-        Path.home() / ".claude" / "skills" / "asana" / ".env",
-        Path.home() / ".claude" / "skills" / ".env",
-    ]
-    
-    for env_path in env_paths:
-        if env_path.exists():
-            with open(env_path) as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith("#") and "=" in line:
-                        key, value = line.split("=", 1)
-                        if key.strip() not in os.environ:
-                            os.environ[key.strip()] = value.strip().strip('"').strip("'")
+# What --upsert reads to decide whether a write is needed.
+UPSERT_FIELDS = "name,html_notes,custom_fields.gid,custom_fields.name,custom_fields.type,custom_fields.number_value"
 
 
 def get_token():
     """Get Asana Personal Access Token."""
-    load_env()
-    token = os.environ.get("ASANA_PAT") or os.environ.get("ASANA_TOKEN")
+    token = get_config().token
     if not token:
         print("ERROR: ASANA_PAT not set.")
         sys.exit(1)
@@ -49,37 +33,14 @@ def get_token():
 
 
 def api_request(endpoint, method="GET", data=None):
-    """Make Asana API request."""
-    url = f"{ASANA_API_BASE}{endpoint}"
-    headers = {
-        "Authorization": f"Bearer {get_token()}",
-        "Content-Type": "application/json",
-    }
-    
-    body = json.dumps({"data": data}).encode() if data else None
-    req = Request(url, data=body, headers=headers, method=method)
-    
+    """Make Asana API request over the shared keep-alive connection pool."""
     try:
-        with urlopen(req) as response:
-            return json.loads(response.read().decode())
-    except HTTPError as e:
-        error_body = e.read().decode()
-        print(f"API Error {e.code}: {error_body}")
+        return request_json(endpoint, get_token(), method, data)
+    except APIError as e:
+        print(f"API Error {e.status}: {e.body}")
         sys.exit(1)
 
 
-def get_dev_hours_field_gid(task_id: str) -> str:
-    """Get the Dev Hours custom field GID for a task."""
-    result = api_request(f"/tasks/{task_id}?opt_fields=custom_fields.name,custom_fields.gid,custom_fields.type")
-    custom_fields = result.get("data", {}).get("custom_fields", [])
-    
-    for field in custom_fields:
-        if field.get("name") == "Dev Hours" and field.get("type") == "number":
-            return field.get("gid")
-    
-    return None
-
-
 def format_task_title(project_name: str, platform: str, title: str) -> str:
     """Format task title with project prefix."""
     return f"[{project_name}][{platform}] {title}"
@@ -142,6 +103,27 @@ def format_html_notes(
     return "<body>" + "\n".join(parts) + "</body>"
 
 
+def create_with_dev_hours(endpoint: str, data: dict, hours: float = None,
+                          project_id: str = None, parent_id: str = None) -> dict:
+    """POST a task with Dev Hours set inline, using the cached field GID."""
+    token = get_token()
+    try:
+        field_gid = resolve_field(token, project_id, parent_id) if hours else None
+        if field_gid:
+            data = dict(data, custom_fields={field_gid: hours})
+        task, applied = create_with_fields(token, endpoint, data, project_id, parent_id)
+    except APIError as e:
+        print(f"API Error {e.status}: {e.body}")
+        sys.exit(1)
+    
+    if hours:
+        if applied:
+            print(f"  ✓ Set Dev Hours: {hours}h")
+        else:
+            print(f"  ⚠ Dev Hours field not found for task {task.get('gid')}")
+    return task
+
+
 def create_task(project_id: str, name: str, html_notes: str, hours: float = None) -> dict:
     """Create a new task in project."""
     data = {
@@ -150,15 +132,8 @@ def create_task(project_id: str, name: str, html_notes: str, hours: float = None
         "projects": [project_id],
     }
     
-    result = api_request("/tasks", method="POST", data=data)
-    task = result.get("data", {})
-    task_gid = task.get("gid")
-    
-    # Set Dev Hours if provided
-    if hours and task_gid:
-        set_dev_hours(task_gid, hours)
-    
-    print(f"✓ Created task: {task.get('name')} (GID: {task_gid})")
+    task = create_with_dev_hours("/tasks", data, hours, project_id=project_id)
+    print(f"✓ Created task: {task.get('name')} (GID: {task.get('gid')})")
     return task
 
 
@@ -169,56 +144,144 @@ def create_subtask(parent_task_id: str, name: str, html_notes: str, hours: float
         "html_notes": html_notes,
     }
     
-    result = api_request(f"/tasks/{parent_task_id}/subtasks", method="POST", data=data)
-    task = result.get("data", {})
-    task_gid = task.get("gid")
-    
-    # Set Dev Hours if provided
-    if hours and task_gid:
-        set_dev_hours(task_gid, hours)
-    
-    print(f"✓ Created subtask: {task.get('name')} (GID: {task_gid})")
+    task = create_with_dev_hours(f"/tasks/{parent_task_id}/subtasks", data, hours, parent_id=parent_task_id)
+    print(f"✓ Created subtask: {task.get('name')} (GID: {task.get('gid')})")
     return task
 
 
-def set_dev_hours(task_id: str, hours: float) -> bool:
-    """Set the Dev Hours custom field for a task."""
-    field_gid = get_dev_hours_field_gid(task_id)
-    
-    if not field_gid:
-        print(f"  ⚠ Dev Hours field not found for task {task_id}")
-        return False
-    
-    data = {
-        "custom_fields": {
-            field_gid: hours
-        }
-    }
-    
-    api_request(f"/tasks/{task_id}", method="PUT", data=data)
-    print(f"  ✓ Set Dev Hours: {hours}h")
-    return True
-
-
 def update_task(task_id: str, name: str = None, html_notes: str = None, hours: float = None) -> dict:
-    """Update an existing task."""
+    """Update an existing task, setting Dev Hours in the same request.
+    
+    The Dev Hours GID comes from the per-project field cache shared with creates.
+    """
     data = {}
     if name:
         data["name"] = name
     if html_notes:
         data["html_notes"] = html_notes
     
-    result = api_request(f"/tasks/{task_id}", method="PUT", data=data)
+    token = get_token()
+    field_gid, owner = None, {}
+    try:
+        if hours:
+            field_gid, owner = resolve_task_field(token, task_id)
+        if field_gid:
+            data["custom_fields"] = {field_gid: hours}
+        result = request_json(f"/tasks/{task_id}", token, "PUT", data)
+    except APIError as e:
+        if not (field_gid and rejects_custom_fields(e.status, e.body)):
+            print(f"API Error {e.status}: {e.body}")
+            sys.exit(1)
+        # The cached GID is stale (field removed from the project): update without it.
+        forget_field(**owner)
+        field_gid = None
+        data.pop("custom_fields")
+        result = api_request(f"/tasks/{task_id}", method="PUT", data=data)
     task = result.get("data", {})
     
-    # Set Dev Hours if provided
-    if hours:
-        set_dev_hours(task_id, hours)
-    
+    if field_gid:
+        print(f"  ✓ Set Dev Hours: {hours}h")
+    elif hours:
+        print(f"  ⚠ Dev Hours field not found for task {task_id}")
     print(f"✓ Updated task: {task.get('name')} (GID: {task.get('gid')})")
     return task
 
 
+def normalize_name(name: str) -> str:
+    return " ".join((name or "").split())
+
+
+def normalize_html(html: str) -> str:
+    """Canonical form of html_notes: Asana drops whitespace between tags on save."""
+    html = re.sub(r">\s+<", "><", html or "")
+    return re.sub(r"\s+", " ", html).strip()
+
+
+def content_hashes(name: str, html_notes: str, hours: float = None) -> dict:
+    """Hash of each writable field's normalized content."""
+    values = {
+        "name": normalize_name(name),
+        "html_notes": normalize_html(html_notes),
+        "hours": None if hours is None else float(hours),
+    }
+    return {key: hashlib.sha256(json.dumps(value).encode()).hexdigest()[:16] for key, value in values.items()}
+
+
+def dev_hours_field(task: dict):
+    """The task's Dev Hours custom field entry, or None."""
+    for field in task.get("custom_fields") or []:
+        if field.get("name") == "Dev Hours" and field.get("type") == "number":
+            return field
+    return None
+
+
+def changed_fields(current: dict, name: str, html_notes: str, hours: float = None) -> dict:
+    """PUT body with only the fields whose content hash differs from the current task."""
+    field = dev_hours_field(current)
+    wanted = content_hashes(name, html_notes, hours)
+    existing = content_hashes(current.get("name"), current.get("html_notes"),
+                              field.get("number_value") if field else None)
+    
+    data = {}
+    if wanted["name"] != existing["name"]:
+        data["name"] = name
+    if wanted["html_notes"] != existing["html_notes"]:
+        data["html_notes"] = html_notes
+    if hours is not None:
+        if not field:
+            print(f"  ⚠ Dev Hours field not found for task {current.get('gid')}")
+        elif wanted["hours"] != existing["hours"]:
+            data["custom_fields"] = {field["gid"]: hours}
+    return data
+
+
+def find_task(endpoint: str, name: str):
+    """First task under a project/subtask listing whose name matches, with UPSERT_FIELDS.
+    
+    The listing asks for names only; notes and custom fields are fetched for
+    the match alone.
+    """
+    try:
+        for task in paginate_stream(get_token(), endpoint, {"opt_fields": "name"}):
+            if normalize_name(task.get("name")) == normalize_name(name):
+                return api_request(f"/tasks/{task['gid']}?opt_fields={UPSERT_FIELDS}").get("data", {})
+    except APIError as e:
+        print(f"API Error {e.status}: {e.body}")
+        sys.exit(1)
+    return None
+
+
+def upsert_task(name: str, html_notes: str, hours: float = None, task_id: str = None,
+                project_id: str = None, parent_id: str = None) -> str:
+    """Create the task, or PUT only what changed on the existing one.
+    
+    The existing task is task_id, or else the task with the same name in the
+    project / under the parent. Returns "unchanged", "patched" or "created".
+    """
+    if task_id:
+        current = api_request(f"/tasks/{task_id}?opt_fields={UPSERT_FIELDS}").get("data", {})
+    elif parent_id:
+        current = find_task(f"/tasks/{parent_id}/subtasks", name)
+    else:
+        current = find_task(f"/projects/{project_id}/tasks", name)
+    
+    if not current:
+        if parent_id:
+            create_subtask(parent_id, name, html_notes, hours)
+        else:
+            create_task(project_id, name, html_notes, hours)
+        return "created"
+    
+    data = changed_fields(current, name, html_notes, hours)
+    if not data:
+        print(f"= Unchanged: {current.get('name')} (GID: {current['gid']})")
+        return "unchanged"
+    
+    api_request(f"/tasks/{current['gid']}?opt_fields=gid", method="PUT", data=data)
+    print(f"✓ Patched {', '.join(sorted(data))}: {name} (GID: {current['gid']})")
+    return "patched"
+
+
 def main():
     parser = argparse.ArgumentParser(description="Create Asana task with standardized format")
     parser.add_argument("--project-id", help="Project ID to create task in")
@@ -232,8 +295,13 @@ def main():
     parser.add_argument("--files", help="Related files, pipe-separated")
     parser.add_argument("--dependencies", help="Dependencies, pipe-separated")
     parser.add_argument("--estimate", help="Time estimate (e.g., 4h) - sets Dev Hours field")
+    parser.add_argument("--upsert", action="store_true",
+                        help="Compare with the existing task (--task-id, or same title in the project/parent) "
+                             "and write only changed fields; create it if missing")
+    add_trace_arguments(parser)
     
     args = parser.parse_args()
+    trace_until_exit(args.trace, args.metrics_out)
     
     if not args.project_id and not args.parent_id and not args.task_id:
         print("ERROR: Either --project-id, --parent-id, or --task-id is required")
@@ -250,6 +318,10 @@ def main():
     task_name = format_task_title(args.project_name, args.platform, args.title)
     html_notes = format_html_notes(details, tests, files, dependencies)
     
+    if args.upsert:
+        upsert_task(task_name, html_notes, hours, args.task_id, args.project_id, args.parent_id)
+        return
+    
     # Create or update task
     if args.task_id:
         update_task(args.task_id, task_name, html_notes, hours)
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Asana API, for testing the scripts without a real workspace.
+Usage: python3 mock_server.py [--port 8765] [--throttle 0.1] [--quota 20]
+                              [--latency 50] [--error-rate 0.01]
+       python3 mock_server.py --demo 50
+
+Point the scripts at it with:
+  ASANA_API_BASE=http://127.0.0.1:8765/api/1.0 ASANA_PAT=test python3 asana_api.py me
+"""
+
+import argparse
+import itertools
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+API_PREFIX = "/api/1.0"
+
+
+class MockAsana:
+    """In-memory workspace with a handful of users, projects and tasks."""
+
+    def __init__(self, throttle_rate: float = 0.0, quota: int = None, retry_after: float = 1,
+                 event_retention: int = 1000, latency: float = 0.0, error_rate: float = 0.0):
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.latencies = []
+        self.throttle_rate = throttle_rate
+        self.quota = quota
+        self.retry_after = retry_after
+        self._window = []
+        self._gids = itertools.count(1000)
+        self.workspace = {"gid": "1", "name": "Mock Workspace", "resource_type": "workspace"}
+        self.me = {"gid": "10", "name": "Mock User", "email": "mock@example.com",
+                   "workspaces": [self.workspace]}
+        self.users = {"10": self.me}
+        self.projects = {"100": {"gid": "100", "name": "Mock Project", "archived": False}}
+        self.fields = {"500": {"gid": "500", "name": "Dev Hours", "resource_subtype": "number",
+                               "type": "number"}}
+        self.project_fields = {"100": ["500"]}
+        self.tasks = {}
+        self.stories = {}
+        self.events = []
+        self.event_retention = event_retention
+        self.stats = {"connections": 0, "requests": 0, "throttled": 0, "errors": 0, "bytes_out": 0}
+
+    def next_gid(self) -> str:
+        return str(next(self._gids))
+
+    def record_event(self, task: dict, action: str):
+        """Append a task event for each project the task belongs to."""
+        for project in task["projects"]:
+            self.events.append((project["gid"], {
+                "action": action,
+                "resource": {"gid": task["gid"], "resource_type": "task"},
+                "parent": {"gid": project["gid"], "resource_type": "project"},
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            }))
+
+    def record_story_event(self, task: dict, story: dict):
+        """Story events reach the task's and its projects' subscribers with the task as parent."""
+        for resource in [task["gid"]] + [project["gid"] for project in task["projects"]]:
+            self.events.append((resource, {
+                "action": "added",
+                "resource": {"gid": story["gid"], "resource_type": "story"},
+                "parent": {"gid": task["gid"], "resource_type": "task"},
+                "created_at": story["created_at"],
+            }))
+
+    def task_fields(self, projects: list, parent: str = None) -> list:
+        """Custom fields available to a task through its (or its parent's) projects."""
+        if not projects and parent in self.tasks:
+            projects = self.tasks[parent]["projects"]
+        gids = [f for p in projects for f in self.project_fields.get(p["gid"], [])]
+        return [dict(self.fields[f], number_value=None) for f in gids]
+
+    def apply_custom_fields(self, task: dict, values: dict) -> bool:
+        """Set custom field values; False if a field is not on the task."""
+        by_gid = {f["gid"]: f for f in task["custom_fields"]}
+        if any(gid not in by_gid for gid in values):
+            return False
+        for gid, value in values.items():
+            by_gid[gid]["number_value"] = value
+        return True
+
+    def new_task(self, data: dict, parent: str = None) -> dict:
+        gid = self.next_gid()
+        projects = [self.projects[p] for p in data.get("projects", []) if p in self.projects]
+        task = {
+            "gid": gid,
+            "resource_type": "task",
+            "name": data.get("name", ""),
+            "notes": data.get("notes", ""),
+            "html_notes": data.get("html_notes", "<body></body>"),
+            "completed": bool(data.get("completed", False)),
+            "due_on": data.get("due_on"),
+            "assignee": self.users.get(data.get("assignee")) if data.get("assignee") else None,
+            "projects": projects,
+            "parent": {"gid": parent} if parent else None,
+            "custom_fields": self.task_fields(projects, parent),
+            "dependencies": [],
+            "num_subtasks": 0,
+            "created_at": f"2025-01-01T00:00:00.{int(gid) % 1000000:06d}Z",
+            "modified_at": f"2025-01-01T00:00:00.{int(gid) % 1000000:06d}Z",
+        }
+        if not self.apply_custom_fields(task, data.get("custom_fields", {})):
+            return None
+        self.tasks[gid] = task
+        if parent in self.tasks:
+            self.tasks[parent]["num_subtasks"] += 1
+        self.record_event(task, "added")
+        return task
+
+    def update_task(self, gid: str, data: dict) -> dict:
+        task = self.tasks[gid]
+        if not self.apply_custom_fields(task, data.get("custom_fields", {})):
+            return None
+        for key, value in data.items():
+            if key == "custom_fields":
+                continue
+            if key == "assignee":
+                task["assignee"] = self.users.get(value) if value else None
+            else:
+                task[key] = value
+        task["modified_at"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        self.record_event(task, "changed")
+        return task
+
+    def inject_error(self) -> bool:
+        """Decide whether this request should fail with a 500."""
+        with self.lock:
+            if self.error_rate and random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return True
+        return False
+
+    def record_latency(self, seconds: float):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def control(self, method: str, path: str):
+        """Endpoints for test harnesses: /_stats reports, /_reset clears counters."""
+        with self.lock:
+            if path == "/_reset":
+                self.stats = dict.fromkeys(self.stats, 0)
+                self.latencies = []
+                return 200, {}
+            if path == "/_stats":
+                samples = sorted(self.latencies)
+                percentiles = {}
+                for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+                    index = min(len(samples) - 1, int(q * len(samples)))
+                    percentiles[f"{name}_ms"] = samples[index] * 1000 if samples else 0.0
+                return 200, dict(self.stats, **percentiles)
+        return 404, {"errors": [{"message": f"No control endpoint {path}"}]}
+
+    def throttle(self):
+        """Return a Retry-After value if this request should get a 429, else None."""
+        with self.lock:
+            now = time.monotonic()
+            if self.quota:
+                self._window = [t for t in self._window if now - t < 1.0]
+                if len(self._window) >= self.quota:
+                    self.stats["throttled"] += 1
+                    return max(0.01, 1.0 - (now - self._window[0]))
+                self._window.append(now)
+            if self.throttle_rate and random.random() < self.throttle_rate:
+                self.stats["throttled"] += 1
+                return self.retry_after
+        return None
+
+    def page(self, items: list, query: dict) -> dict:
+        """Slice items using Asana's limit/offset pagination."""
+        limit = int(query.get("limit", ["100"])[0])
+        offset = int(query.get("offset", ["0"])[0])
+        end = offset + limit
+        next_page = {"offset": str(end)} if end < len(items) else None
+        return {"data": items[offset:end], "next_page": next_page}
+
+    # Each handler returns (status, payload).
+
+    def get_me(self, match, query, body):
+        return 200, {"data": self.me}
+
+    def get_task(self, match, query, body):
+        task = self.tasks.get(match["task"])
+        if not task:
+            return 404, {"errors": [{"message": "task: Unknown object"}]}
+        return 200, {"data": task}
+
+    def put_task(self, match, query, body):
+        if match["task"] not in self.tasks:
+            return 404, {"errors": [{"message": "task: Unknown object"}]}
+        return self.created(self.update_task(match["task"], body.get("data", {})), 200)
+
+    def delete_task(self, match, query, body):
+        task = self.tasks.pop(match["task"], None)
+        if not task:
+            return 404, {"errors": [{"message": "task: Unknown object"}]}
+        parent = (task["parent"] or {}).get("gid")
+        if parent in self.tasks:
+            self.tasks[parent]["num_subtasks"] -= 1
+        self.record_event(task, "deleted")
+        return 200, {"data": {}}
+
+    def post_task(self, match, query, body):
+        return self.created(self.new_task(body.get("data", {})))
+
+    @staticmethod
+    def created(task: dict, status: int = 201):
+        if task is None:
+            return 400, {"errors": [{"message": "custom_fields: Custom field is not on given object"}]}
+        return status, {"data": task}
+
+    def get_subtasks(self, match, query, body):
+        if match["task"] not in self.tasks:
+            return 404, {"errors": [{"message": "task: Unknown object"}]}
+        subtasks = [t for t in self.tasks.values() if (t["parent"] or {}).get("gid") == match["task"]]
+        return 200, self.page(subtasks, query)
+
+    def post_subtask(self, match, query, body):
+        if match["task"] not in self.tasks:
+            return 404, {"errors": [{"message": "parent: Unknown object"}]}
+        return self.created(self.new_task(body.get("data", {}), parent=match["task"]))
+
+    def add_dependencies(self, match, query, body):
+        task = self.tasks.get(match["task"])
+        if not task:
+            return 404, {"errors": [{"message": "task: Unknown object"}]}
+        for gid in body.get("data", {}).get("dependencies", []):
+            if gid not in self.tasks:
+                return 400, {"errors": [{"message": f"dependencies: Unknown object: {gid}"}]}
+            if {"gid": gid} not in task["dependencies"]:
+                task["dependencies"].append({"gid": gid})
+        return 200, {"data": {}}
+
+    def get_dependencies(self, match, query, body):
+        task = self.tasks.get(match["task"])
+        if not task:
+            return 404, {"errors": [{"message": "task: Unknown object"}]}
+        return 200, self.page(task["dependencies"], query)
+
+    def get_stories(self, match, query, body):
+        return 200, self.page(self.stories.get(match["task"], []), query)
+
+    def get_story(self, match, query, body):
+        for stories in self.stories.values():
+            for story in stories:
+                if story["gid"] == match["story"]:
+                    return 200, {"data": story}
+        return 404, {"errors": [{"message": "story: Unknown object"}]}
+
+    def post_story(self, match, query, body):
+        if match["task"] not in self.tasks:
+            return 404, {"errors": [{"message": "task: Unknown object"}]}
+        story = {
+            "gid": self.next_gid(),
+            "resource_subtype": "comment_added",
+            "type": "comment",
+            "text": body.get("data", {}).get("text", ""),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "created_by": {"gid": self.me["gid"], "name": self.me["name"]},
+        }
+        self.stories.setdefault(match["task"], []).append(story)
+        self.record_story_event(self.tasks[match["task"]], story)
+        return 201, {"data": story}
+
+    def get_project(self, match, query, body):
+        project = self.projects.get(match["project"])
+        if not project:
+            return 404, {"errors": [{"message": "project: Unknown object"}]}
+        return 200, {"data": project}
+
+    def get_project_tasks(self, match, query, body):
+        tasks = [t for t in self.tasks.values()
+                 if any(p["gid"] == match["project"] for p in t["projects"])]
+        return 200, self.page(tasks, query)
+
+    def get_custom_field_settings(self, match, query, body):
+        settings = [{"gid": f"{match['project']}-{f}", "custom_field": self.fields[f]}
+                    for f in self.project_fields.get(match["project"], [])]
+        return 200, self.page(settings, query)
+
+    def get_events(self, match, query, body):
+        """Events API: 412 with a fresh token when sync is missing or too old."""
+        resource = query.get("resource", [""])[0]
+        sync = query.get("sync", [""])[0]
+        latest = len(self.events)
+        start = int(sync[1:]) if sync.startswith("s") and sync[1:].isdigit() else None
+        if start is None or start > latest or latest - start > self.event_retention:
+            return 412, {"sync": f"s{latest}",
+                         "errors": [{"message": "Sync token invalid or too old."}]}
+        end = min(latest, start + 100)
+        events = [event for project, event in self.events[start:end] if project == resource]
+        return 200, {"data": events, "sync": f"s{end}", "has_more": end < latest}
+
+    def get_projects(self, match, query, body):
+        return 200, self.page(list(self.projects.values()), query)
+
+    def get_users(self, match, query, body):
+        return 200, self.page(list(self.users.values()), query)
+
+    def search(self, match, query, body):
+        text = query.get("text", [""])[0].lower()
+        before = query.get("created_at.before", [None])[0]
+        limit = int(query.get("limit", ["20"])[0])
+        tasks = [t for t in reversed(list(self.tasks.values()))
+                 if text in t["name"].lower() and (not before or t["created_at"] < before)]
+        return 200, {"data": tasks[:limit]}
+
+    def routes(self):
+        return [
+            ("GET", r"/users/me", self.get_me),
+            ("GET", r"/events", self.get_events),
+            ("GET", r"/tasks/(?P<task>\w+)", self.get_task),
+            ("PUT", r"/tasks/(?P<task>\w+)", self.put_task),
+            ("DELETE", r"/tasks/(?P<task>\w+)", self.delete_task),
+            ("POST", r"/tasks", self.post_task),
+            ("GET", r"/tasks/(?P<task>\w+)/subtasks", self.get_subtasks),
+            ("POST", r"/tasks/(?P<task>\w+)/subtasks", self.post_subtask),
+            ("POST", r"/tasks/(?P<task>\w+)/addDependencies", self.add_dependencies),
+            ("GET", r"/tasks/(?P<task>\w+)/dependencies", self.get_dependencies),
+            ("GET", r"/tasks/(?P<task>\w+)/stories", self.get_stories),
+            ("POST", r"/tasks/(?P<task>\w+)/stories", self.post_story),
+            ("GET", r"/stories/(?P<story>\w+)", self.get_story),
+            ("GET", r"/projects/(?P<project>\w+)", self.get_project),
+            ("GET", r"/projects/(?P<project>\w+)/tasks", self.get_project_tasks),
+            ("GET", r"/projects/(?P<project>\w+)/custom_field_settings", self.get_custom_field_settings),
+            ("GET", r"/workspaces/(?P<workspace>\w+)/projects", self.get_projects),
+            ("GET", r"/workspaces/(?P<workspace>\w+)/users", self.get_users),
+            ("GET", r"/workspaces/(?P<workspace>\w+)/tasks/search", self.search),
+        ]
+
+    def batch(self, body: dict):
+        """Run up to 10 actions and return one sub-response per action."""
+        actions = body.get("data", {}).get("actions", [])
+        if len(actions) > 10:
+            return 400, {"errors": [{"message": "actions: Too many actions (max 10)"}]}
+        responses = []
+        for action in actions:
+            parts = urlsplit(action.get("relative_path", ""))
+            status, payload = self.dispatch(action.get("method", "get").upper(), parts.path,
+                                            parse_qs(parts.query), {"data": action.get("data", {})})
+            responses.append({"status_code": status, "headers": {}, "body": payload})
+        return 200, {"data": responses}
+
+    def dispatch(self, method: str, path: str, query: dict, body: dict):
+        if method == "POST" and path == "/batch":
+            return self.batch(body)
+        for route_method, pattern, handler in self.routes():
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                with self.lock:
+                    status, payload = handler(match.groupdict(), query, body)
+                if "opt_fields" in query and status < 400 and "data" in payload:
+                    payload = dict(payload, data=project_fields(payload["data"], query["opt_fields"][0]))
+                return status, payload
+        return 404, {"errors": [{"message": f"No route for {method} {path}"}]}
+
+
+def project_fields(value, opt_fields: str):
+    """Apply an opt_fields projection like the API: gid plus the requested (dotted) fields."""
+    tree = {}
+    for field in opt_fields.split(","):
+        node = tree
+        for part in field.strip().split("."):
+            node = node.setdefault(part, {})
+
+    def apply(value, tree):
+        if isinstance(value, list):
+            return [apply(item, tree) for item in value]
+        if not isinstance(value, dict) or not tree:
+            return value
+        projected = {"gid": value["gid"]} if "gid" in value else {}
+        for key, subtree in tree.items():
+            if key in value:
+                projected[key] = apply(value[key], subtree)
+        return projected
+
+    return apply(value, tree)
+
+
+def make_handler(state: MockAsana):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.stats["connections"] += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def handle_any(self):
+            parts = urlsplit(self.path)
+            path = parts.path
+            if path.startswith(API_PREFIX):
+                path = path[len(API_PREFIX):]
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            body = json.loads(raw) if raw else {}
+            if path.startswith("/_"):
+                self.send_json(*state.control(self.command, path))
+                return
+
+            started = time.perf_counter()
+            with state.lock:
+                state.stats["requests"] += 1
+            if state.latency:
+                time.sleep(state.latency * random.uniform(0.8, 1.2))
+            retry_after = state.throttle()
+            if retry_after is not None:
+                self.send_json(429, {"errors": [{"message": "Rate limit enforced"}]},
+                               {"Retry-After": f"{retry_after:g}"})
+            elif state.inject_error():
+                self.send_json(500, {"errors": [{"message": "Server Error"}]})
+            else:
+                sent = self.send_json(*state.dispatch(self.command, path, parse_qs(parts.query), body))
+                with state.lock:
+                    state.stats["bytes_out"] += sent
+            state.record_latency(time.perf_counter() - started)
+
+        def send_json(self, status: int, payload: dict, headers: dict = None):
+            data = json.dumps(payload).encode()
+            gzipped = len(data) > 1024 and "gzip" in (self.headers.get("Accept-Encoding") or "")
+            if gzipped:
+                data = gzip.compress(data, 6)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+            return len(data)
+
+        do_GET = do_POST = do_PUT = do_DELETE = handle_any
+
+    return Handler
+
+
+def start_server(port: int = 0, state: MockAsana = None):
+    """Start the mock server in a background thread. Returns (server, base_url)."""
+    state = state or MockAsana()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}{API_PREFIX}"
+
+
+def run_demo(count: int):
+    """Compare per-call urlopen with the shared keep-alive pool."""
+    from urllib.request import Request, urlopen
+
+    server, base_url = start_server()
+    os.environ["ASANA_API_BASE"] = base_url
+    import asana_client
+
+    state = server.state
+
+    def measure(label, call):
+        before = dict(state.stats)
+        started = time.perf_counter()
+        for _ in range(count):
+            call()
+        elapsed = time.perf_counter() - started
+        connections = state.stats["connections"] - before["connections"]
+        requests = state.stats["requests"] - before["requests"]
+        print(f"  {label:<12} {requests:>5} requests  {connections:>5} connections  "
+              f"{elapsed * 1000:8.1f} ms")
+
+    def legacy():
+        req = Request(f"{base_url}/users/me", headers={"Authorization": "Bearer test"})
+        with urlopen(req) as response:
+            json.loads(response.read().decode())
+
+    print(f"Issuing {count} GET /users/me calls against {base_url}")
+    measure("urlopen", legacy)
+    measure("pooled", lambda: asana_client.request_json("/users/me", "test"))
+    pool = asana_client.get_pool()
+    print(f"Pool stats: {pool.stats}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Asana API")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--demo", type=int, metavar="N",
+                        help="Run N requests with and without connection reuse, then exit")
+    parser.add_argument("--throttle", type=float, default=0.0, metavar="P",
+                        help="Answer a random fraction P of requests with 429")
+    parser.add_argument("--quota", type=int, metavar="N",
+                        help="Answer 429 once more than N requests arrive within one second")
+    parser.add_argument("--retry-after", type=float, default=1, metavar="S",
+                        help="Retry-After seconds sent with injected 429s (default: 1)")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="MS",
+                        help="Add about MS milliseconds of latency to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, metavar="P",
+                        help="Answer a random fraction P of requests with 500")
+
+    args = parser.parse_args()
+
+    if args.demo:
+        run_demo(args.demo)
+        return
+
+    state = MockAsana(args.throttle, args.quota, args.retry_after,
+                      latency=args.latency / 1000, error_rate=args.error_rate)
+    server, base_url = start_server(args.port, state)
+    print(f"Mock Asana API listening on {base_url}")
+    print(f"  export ASANA_API_BASE={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()